@@ -0,0 +1,109 @@
+"""Сравнение поиска по FTS5-индексу с LIKE-сканом таблицы постов.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_search.py --sizes 100000 1000000
+
+Посты пишутся во временную базу SQLite, рабочая база не трогается.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common import setup_django
+
+INSERT_BATCH = 10000
+WORDS_IN_POST = 20
+
+
+def make_vocabulary(size):
+    letters = 'абвгдежзиклмнопрстуфхцчшэюя'
+    return [
+        ''.join(random.choices(letters, k=random.randint(4, 9)))
+        for _ in range(size)
+    ]
+
+
+def fill_posts(total, vocabulary, rare_word):
+    """Дописать посты до total штук; каждый тысячный содержит rare_word."""
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from posts.models import Post, User
+
+    author, _ = User.objects.get_or_create(username='bench')
+    now = timezone.now().isoformat()
+    with connection.cursor() as cursor:
+        start = Post.objects.count()
+        while start < total:
+            stop = min(start + INSERT_BATCH, total)
+            rows = []
+            for number in range(start, stop):
+                words = random.choices(vocabulary, k=WORDS_IN_POST)
+                if number % 1000 == 0:
+                    words[-1] = rare_word
+                rows.append((' '.join(words), now, now, author.pk))
+            with transaction.atomic():
+                cursor.executemany(
+                    'INSERT INTO posts_post '
+                    '(text, pub_date, updated, author_id, image, '
+                    'thumbnails_ready, comments_count) '
+                    "VALUES (%s, %s, %s, %s, '', 0, 0)",
+                    rows,
+                )
+            start = stop
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def run(sizes, repeat):
+    from posts import search
+    from posts.models import Post
+
+    vocabulary = make_vocabulary(5000)
+    common_word, rare_word = vocabulary[0], 'редкослово'
+    print(f'{"постов":>9} {"слово":>8} {"LIKE, мс":>10} {"FTS, мс":>10} '
+          f'{"страница FTS, мс":>17}')
+    for size in sorted(sizes):
+        fill_posts(size, vocabulary, rare_word)
+        for label, word in (('частое', common_word), ('редкое', rare_word)):
+            like = measure(
+                lambda: Post.objects.filter(text__icontains=word).count(),
+                repeat,
+            )
+            fts = measure(
+                lambda: Post.objects.filter(
+                    pk__in=search.matching_ids(word)
+                ).count(),
+                repeat,
+            )
+            page = measure(lambda: search.search_posts(word), repeat)
+            print(f'{size:>9} {label:>8} {like:>10.1f} {fts:>10.1f} '
+                  f'{page:>17.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100000, 1000000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        setup_django(os.path.join(tmp_dir, 'bench.sqlite3'))
+        run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Отрисовка index.html с 10 постами с кеширующим загрузчиком и без него.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_templates.py --repeat 500
+
+Кеш карточек сбрасывается перед каждой отрисовкой, так что каждый раз
+рисуются все карточки и include. Разница между строками - стоимость
+чтения и разбора шаблонов с диска, которую убирает YATUBE_DEBUG=0.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from copy import deepcopy
+from unittest import mock
+
+from common import setup_django
+
+POSTS = 10
+
+
+def loader_variants():
+    from django.conf import settings
+
+    plain = deepcopy(settings.TEMPLATES)
+    plain[0]['OPTIONS']['loaders'] = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    cached = deepcopy(plain)
+    cached[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader',
+         plain[0]['OPTIONS']['loaders']),
+    ]
+    return (('без кеша', plain), ('кеширующий', cached))
+
+
+def make_page():
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    from posts.models import Group, Post, User
+    from posts.views import POSTS_ON_PAGE, get_paginator
+
+    author = User.objects.create_user('bench', first_name='Имя')
+    group = Group.objects.create(
+        title='Группа', slug='group', description='Описание'
+    )
+    for number in range(POSTS):
+        Post.objects.create(
+            text=f'Пост номер {number} ' * 20, author=author, group=group
+        )
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    page = get_paginator(
+        request, Post.objects.for_feed(), lambda: POSTS, cursor=True
+    )
+    assert len(page.object_list) == min(POSTS, POSTS_ON_PAGE)
+    return request, page
+
+
+def measure(request, page, repeat):
+    """Медиана отрисовки в мс и число разобранных шаблонов за отрисовку."""
+    from django.core.cache import cache
+    from django.template.base import Template
+    from django.template.loader import render_to_string
+
+    def render():
+        cache.clear()
+        render_to_string('posts/index.html', {'page_obj': page}, request)
+
+    render()
+    timings = []
+    with mock.patch.object(
+        Template, 'compile_nodelist', autospec=True,
+        side_effect=Template.compile_nodelist,
+    ) as compile_nodelist:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, compile_nodelist.call_count
+
+
+def run(repeat):
+    from django.test import override_settings
+
+    request, page = make_page()
+    print(f'{"загрузчик":>12} {"мс на отрисовку":>16} '
+          f'{"разборов на отрисовку":>22}')
+    for label, templates in loader_variants():
+        with override_settings(TEMPLATES=templates):
+            median, compiled = measure(request, page, repeat)
+        print(f'{label:>12} {median:>16.2f} {compiled / repeat:>22.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        setup_django(
+            os.path.join(tmp_dir, 'bench.sqlite3'),
+            os.path.join(tmp_dir, 'media'),
+        )
+        run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,644 @@
+"""Нагрузочный прогон основных страниц на засеянной базе SQLite.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_views.py --posts 100000 --output new.json
+    python benchmarks/bench_views.py --baseline old.json --output new.json
+    python benchmarks/bench_views.py --compare old.json new.json
+    python benchmarks/bench_views.py --transport wsgi asgi --concurrency 64
+
+База засевается пачками прямо в SQL, затем каждая страница гоняется
+с фиксированной параллельностью через тестовый клиент Django, через
+локальный WSGI-сервер с потоком на соединение и через yatube.asgi
+с пулом из YATUBE_ASGI_THREADS потоков. Для каждого сценария печатаются
+p50/p95/p99 и запросов в секунду; --output пишет результаты в JSON,
+а с --baseline скрипт завершается с кодом 1, если стало хуже больше чем
+на --max-regression. Все пишется во временный каталог, рабочая база
+и media не трогаются.
+"""
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socketserver
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from urllib.parse import unquote, urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from common import BASE_DIR, setup_django
+
+INSERT_BATCH = 10000
+IMAGE_VARIANTS = 8
+BENCH_USER = 'bench'
+WARMUP_REQUESTS = 5
+TRANSPORTS = ('client', 'wsgi', 'asgi')
+LISTEN_BACKLOG = 1024
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'post_create',
+    'post_edit',
+)
+WORDS = (
+    'утро', 'город', 'дорога', 'кофе', 'книга', 'море', 'поезд', 'снег',
+    'работа', 'музыка', 'кот', 'окно', 'лето', 'письмо', 'друг', 'вечер',
+)
+
+
+def insert_rows(sql, rows):
+    from django.db import connection, transaction
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH):
+            with transaction.atomic():
+                cursor.executemany(sql, rows[start:start + INSERT_BATCH])
+
+
+def post_rows(total, author_ids, group_ids, images, image_share, started):
+    """Посты по возрастанию даты: у каждого автор, часть в группах."""
+    for number in range(total):
+        # Как пишет Django: без T и смещения, иначе функции дат SQLite
+        # в Django вернут NULL.
+        moment = str((started + timedelta(seconds=number)).replace(
+            tzinfo=None
+        ))
+        image = random.choice(images) if random.random() < image_share else ''
+        group = random.choice(group_ids) if random.random() < 0.7 else None
+        yield (
+            ' '.join(random.choices(WORDS, k=random.randint(8, 40))),
+            moment, moment, random.choice(author_ids), group, image,
+            bool(image),
+        )
+
+
+def make_images(count):
+    """Несколько разных картинок в хранилище с уже нарезанными миниатюрами."""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    from posts.images import normalize_image
+    from posts.models import Post
+    from posts.thumbnails import make_thumbnails
+
+    field = Post._meta.get_field('image')
+    names = []
+    for number in range(count):
+        buffer = io.BytesIO()
+        color = (number * 30 % 256, 90, 255 - number * 30 % 256)
+        Image.new('RGB', (1600, 1200), color).save(buffer, 'JPEG')
+        upload = SimpleUploadedFile('seed.jpg', buffer.getvalue())
+        content = normalize_image(upload)
+        name = field.storage.save(
+            field.generate_filename(None, content.name), content
+        )
+        make_thumbnails(field.attr_class(None, field, name))
+        names.append(name)
+    return names
+
+
+def seed(users, groups, posts, image_share):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    from posts.activity import rollup
+    from posts.counts import repair_counters
+    from posts.models import Group
+
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    insert_rows(
+        'INSERT INTO auth_user (password, is_superuser, username, '
+        'first_name, last_name, email, is_staff, is_active, date_joined) '
+        "VALUES (%s, 0, %s, %s, %s, '', 0, 1, %s)",
+        [
+            (make_password(None), f'user{number}', 'Имя', f'Автор {number}',
+             now.isoformat())
+            for number in range(users)
+        ],
+    )
+    User.objects.create_user(BENCH_USER)
+    insert_rows(
+        'INSERT INTO posts_group (title, slug, description, posts_count) '
+        'VALUES (%s, %s, %s, 0)',
+        [
+            (f'Группа {number}', f'group-{number}', 'Описание группы')
+            for number in range(groups)
+        ],
+    )
+    author_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    images = make_images(IMAGE_VARIANTS) if image_share else ['']
+    insert_rows(
+        'INSERT INTO posts_post (text, pub_date, updated, author_id, '
+        'group_id, image, thumbnails_ready, comments_count) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s, 0)',
+        list(post_rows(
+            posts, author_ids, group_ids, images, image_share,
+            now - timedelta(seconds=posts),
+        )),
+    )
+    repair_counters()
+    rollup(rebuild_window=True)
+    print(
+        f'Засеяно: пользователей {users}, групп {groups}, постов {posts} '
+        f'за {time.monotonic() - started:.1f} с',
+        file=sys.stderr,
+    )
+
+
+class Targets:
+    """Адреса и данные запросов, выбранные из засеянной базы."""
+
+    def __init__(self):
+        from django.contrib.auth.models import User
+
+        from posts.models import Group, Post
+
+        self.user = User.objects.get(username=BENCH_USER)
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.usernames = list(User.objects.filter(
+            profile__posts_count__gt=0
+        ).values_list('username', flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        self.own_post_ids = list(
+            self.user.posts.values_list('pk', flat=True)
+        )
+        if not self.own_post_ids:
+            self.own_post_ids = [
+                Post.objects.create(author=self.user, text='пост').pk
+            ]
+
+    def request(self, scenario, number):
+        """Метод, адрес и тело запроса number сценария scenario."""
+        from django.urls import reverse
+
+        pick = random.Random(number).choice
+        text = ' '.join(pick(WORDS) for _ in range(12))
+        if scenario == 'index':
+            return 'GET', reverse('posts:index'), None
+        if scenario == 'group_posts':
+            slug = pick(self.slugs)
+            return 'GET', reverse('posts:group_list', args=[slug]), None
+        if scenario == 'profile':
+            username = pick(self.usernames)
+            return 'GET', reverse('posts:profile', args=[username]), None
+        if scenario == 'post_detail':
+            post_id = pick(self.post_ids)
+            return 'GET', reverse('posts:post_detail', args=[post_id]), None
+        if scenario == 'post_create':
+            return 'POST', reverse('posts:create'), {'text': text}
+        post_id = pick(self.own_post_ids)
+        return 'POST', reverse('posts:edit', args=[post_id]), {'text': text}
+
+
+class ClientDriver:
+    """Тестовый клиент Django: полный стек middleware без сети."""
+
+    def __init__(self, user, guest):
+        self.user = None if guest else user
+        self.local = threading.local()
+
+    def send(self, method, path, data):
+        from django.test import Client
+
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+            if self.user is not None:
+                client.force_login(self.user)
+        if method == 'GET':
+            return client.get(path).status_code
+        return client.post(path, data).status_code
+
+    def close(self):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # Под высокой параллельностью очередь по умолчанию в 5 соединений
+    # дает повторные SYN и секундные хвосты, которых нет у ASGI-сервера.
+    request_queue_size = LISTEN_BACKLOG
+
+
+class HTTPDriver:
+    """Настоящий HTTP до локального сервера в фоновом потоке."""
+
+    def __init__(self, user, guest):
+        from django.conf import settings
+        from django.middleware.csrf import _get_new_csrf_token
+        from django.test import Client
+
+        self.address = self.start()
+        self.csrf_token = _get_new_csrf_token()
+        cookies = {settings.CSRF_COOKIE_NAME: self.csrf_token}
+        if not guest:
+            client = Client()
+            client.force_login(user)
+            cookies[settings.SESSION_COOKIE_NAME] = (
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+        self.cookie = '; '.join(f'{k}={v}' for k, v in cookies.items())
+
+    def start(self):
+        """Запускает сервер и возвращает его (хост, порт)."""
+        raise NotImplementedError
+
+    def send(self, method, path, data):
+        headers = {'Cookie': self.cookie}
+        body = None
+        if method == 'POST':
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+        connection = http.client.HTTPConnection(*self.address, timeout=30)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+class WSGIDriver(HTTPDriver):
+    """wsgiref с потоком на соединение, как yatube.wsgi."""
+
+    def start(self):
+        from django.core.wsgi import get_wsgi_application
+
+        self.server = ThreadingWSGIServer(('127.0.0.1', 0), QuietHandler)
+        self.server.set_app(get_wsgi_application())
+        threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        ).start()
+        return self.server.server_address
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ASGIDriver(HTTPDriver):
+    """yatube.asgi за минимальным HTTP/1.1-сервером на asyncio.
+
+    Сервер отвечает на один запрос в соединении и закрывает его, как
+    и клиент бенчмарка. Потоков для Django не больше YATUBE_ASGI_THREADS.
+    """
+
+    def start(self):
+        from core.asgi import WSGIToASGI
+
+        self.application = WSGIToASGI()
+        self.tasks = set()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, daemon=True
+        )
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(asyncio.start_server(
+            self.accept, '127.0.0.1', 0, backlog=LISTEN_BACKLOG
+        ), self.loop).result()
+        return self.server.sockets[0].getsockname()[:2]
+
+    def accept(self, reader, writer):
+        """Запомнить задачу соединения, чтобы close() ее дождался."""
+        task = self.loop.create_task(self.handle(reader, writer))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def handle(self, reader, writer):
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, *lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = request_line.split(' ')
+        headers = [
+            (name.strip().lower().encode('latin-1'),
+             value.strip().encode('latin-1'))
+            for name, value in (
+                line.split(':', 1) for line in lines if line
+            )
+        ]
+        length = int(dict(headers).get(b'content-length', 0))
+        messages = [{
+            'type': 'http.request',
+            'body': await reader.readexactly(length),
+        }]
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'server': self.address,
+            'client': writer.get_extra_info('peername')[:2],
+        }
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Как у настоящего сервера: о разрыве сообщаем, только когда
+            # клиент закрыл соединение.
+            await reader.read()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+                    .encode('latin-1')
+                )
+                for name, value in message['headers']:
+                    writer.write(name + b': ' + value + b'\r\n')
+                writer.write(b'Connection: close\r\n\r\n')
+            else:
+                writer.write(message.get('body', b''))
+            await writer.drain()
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            writer.close()
+
+    async def finish(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.finish(), self.loop).result()
+        self.application.executor.shutdown()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def percentile(timings, share):
+    """Ближайший ранг по отсортированному списку."""
+    index = max(0, min(len(timings) - 1, round(share * len(timings)) - 1))
+    return timings[index]
+
+
+def run_scenario(driver, targets, scenario, requests, concurrency):
+    def call(number):
+        method, path, data = targets.request(scenario, number)
+        started = time.perf_counter()
+        try:
+            status = driver.send(method, path, data)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        # Удачная форма отвечает редиректом, иначе ее отрисовали с ошибками.
+        return elapsed, status == (302 if method == 'POST' else 200)
+
+    for number in range(WARMUP_REQUESTS):
+        call(-1 - number)
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        outcomes = list(pool.map(call, range(requests)))
+        wall = time.perf_counter() - started
+    timings = sorted(elapsed * 1000 for elapsed, _ in outcomes)
+    return {
+        'scenario': scenario,
+        'requests': requests,
+        'errors': sum(not ok for _, ok in outcomes),
+        'rps': requests / wall,
+        'mean_ms': sum(timings) / len(timings),
+        'p50_ms': percentile(timings, 0.50),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+    }
+
+
+def restore_database(seed_path, db_path):
+    """Каждый транспорт начинает со своей копии засеянной базы.
+
+    Соединения потоков прошлого прогона могли остаться открытыми, поэтому
+    копия кладется в новый файл, а не поверх старого.
+    """
+    from django.core.cache import cache
+    from django.db import connections
+
+    connections.close_all()
+    shutil.copyfile(seed_path, db_path)
+    connections.databases['default']['NAME'] = db_path
+    cache.clear()
+
+
+def run(args, tmp_dir, seed_path):
+    drivers = {
+        'client': ClientDriver, 'wsgi': WSGIDriver, 'asgi': ASGIDriver,
+    }
+    transports = []
+    for transport in args.transport:
+        names = ('client', 'wsgi') if transport == 'both' else [transport]
+        transports.extend(
+            name for name in names if name not in transports
+        )
+    results = []
+    for transport in transports:
+        restore_database(
+            seed_path, os.path.join(tmp_dir, f'{transport}.sqlite3')
+        )
+        targets = Targets()
+        driver = drivers[transport](targets.user, args.guest)
+        try:
+            for scenario in args.scenarios:
+                if args.guest and scenario in ('post_create', 'post_edit'):
+                    continue
+                row = run_scenario(
+                    driver, targets, scenario, args.requests,
+                    args.concurrency,
+                )
+                row['transport'] = transport
+                results.append(row)
+                print_row(row)
+        finally:
+            driver.close()
+    return results
+
+
+def git_revision():
+    def git(*command):
+        return subprocess.run(
+            ['git', *command], cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def describe(args):
+    import django
+    from django.conf import settings
+
+    return {
+        **git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'dataset': {
+            'users': args.users,
+            'groups': args.groups,
+            'posts': args.posts,
+            'image_share': args.image_share,
+        },
+        'concurrency': args.concurrency,
+        'asgi_threads': settings.ASGI_THREADS,
+        'requests': args.requests,
+        'guest': args.guest,
+    }
+
+
+def print_row(row):
+    print(
+        f'{row["transport"]:>7} {row["scenario"]:>12} {row["rps"]:>8.1f} '
+        f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} '
+        f'{row["p99_ms"]:>8.1f} {row["errors"]:>7}'
+    )
+
+
+def print_header():
+    print(f'{"транспорт":>7} {"сценарий":>12} {"зап/с":>8} {"p50, мс":>8} '
+          f'{"p95, мс":>8} {"p99, мс":>8} {"ошибок":>7}')
+
+
+def compare(baseline, current, max_regression):
+    """Сценарии, где p95 вырос или rps упал больше допустимого."""
+    known = {
+        (row['transport'], row['scenario']): row
+        for row in baseline['results']
+    }
+    regressions = []
+    for row in current['results']:
+        before = known.get((row['transport'], row['scenario']))
+        if before is None:
+            continue
+        if row['errors'] > before['errors']:
+            regressions.append(
+                f'{row["transport"]}/{row["scenario"]}: ошибок '
+                f'{before["errors"]} -> {row["errors"]}'
+            )
+        if row['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(
+                f'{row["transport"]}/{row["scenario"]}: p95 '
+                f'{before["p95_ms"]:.1f} -> {row["p95_ms"]:.1f} мс'
+            )
+        if row['rps'] < before['rps'] / (1 + max_regression):
+            regressions.append(
+                f'{row["transport"]}/{row["scenario"]}: зап/с '
+                f'{before["rps"]:.1f} -> {row["rps"]:.1f}'
+            )
+    return regressions
+
+
+def report_regressions(baseline, current, max_regression):
+    if baseline['meta'].get('dataset') != current['meta'].get('dataset'):
+        print('Внимание: наборы данных в сравниваемых прогонах разные.',
+              file=sys.stderr)
+    regressions = compare(baseline, current, max_regression)
+    for line in regressions:
+        print(f'Регрессия {line}', file=sys.stderr)
+    if not regressions:
+        print(f'Регрессий больше {max_regression:.0%} нет.', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument(
+        '--image-share', type=float, default=0.2,
+        help='Доля постов с картинкой, от 0 до 1.',
+    )
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument(
+        '--requests', type=int, default=200,
+        help='Запросов на каждый сценарий.',
+    )
+    parser.add_argument(
+        '--transport', nargs='+', choices=(*TRANSPORTS, 'both'),
+        default=['both'], help='both - client и wsgi.',
+    )
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS
+    )
+    parser.add_argument(
+        '--guest', action='store_true',
+        help='Гость вместо автора: с кешем страниц и без записи.',
+    )
+    parser.add_argument('--output', help='Куда записать результаты в JSON.')
+    parser.add_argument('--baseline', help='JSON прошлого прогона.')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+        help='Только сравнить два готовых JSON без прогона.',
+    )
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        baseline, current = map(load, args.compare)
+        sys.exit(report_regressions(baseline, current, args.max_regression))
+    if not 0 <= args.image_share <= 1:
+        sys.exit('--image-share должна быть от 0 до 1.')
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        seed_path = os.path.join(tmp_dir, 'seed.sqlite3')
+        # Настройки как на боевом сервере: без отладки, шаблоны в кеше,
+        # SQLite в режиме WAL.
+        os.environ['YATUBE_PROFILE'] = 'production'
+        setup_django(seed_path, os.path.join(tmp_dir, 'media'))
+        seed(args.users, args.groups, args.posts, args.image_share)
+        print_header()
+        current = {'meta': describe(args), 'results': run(
+            args, tmp_dir, seed_path
+        )}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as target:
+            json.dump(current, target, ensure_ascii=False, indent=2)
+    if args.baseline:
+        sys.exit(report_regressions(
+            load(args.baseline), current, args.max_regression
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""Общая настройка бенчмарков: проект в sys.path и временная база."""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+def setup_django(db_path, media_root=None):
+    """Запустить Django на отдельной базе, чтобы не трогать рабочую."""
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = db_path
+    if media_root is not None:
+        settings.MEDIA_ROOT = media_root
+    django.setup()
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
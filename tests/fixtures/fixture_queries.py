@@ -0,0 +1,51 @@
+import functools
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mixer.backend.django import mixer as _mixer
+from posts.models import Post
+
+
+def query_budget(max_queries):
+    """Декоратор теста: тело теста укладывается в max_queries запросов."""
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(*args, **kwargs):
+            with CaptureQueriesContext(connection) as context:
+                result = test(*args, **kwargs)
+            executed = [query['sql'] for query in context.captured_queries]
+            assert len(executed) <= max_queries, (
+                f'Тест `{test.__name__}` сделал {len(executed)} запросов '
+                f'к базе при бюджете {max_queries}:\n' + '\n'.join(executed)
+            )
+            return result
+        return wrapper
+    return decorator
+
+
+@pytest.fixture
+def count_queries():
+    """Число запросов к базе на один GET с холодным кешем."""
+    def count(client, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data)
+        assert response.status_code < 400, (
+            f'Страница `{url}` вернула код {response.status_code}'
+        )
+        return len(context)
+    return count
+
+
+@pytest.fixture
+def grow_posts(user, group, settings, tmp_path):
+    """Досоздать посты автора в группе, пока их не станет total."""
+    settings.MEDIA_ROOT = str(tmp_path)
+
+    def grow(total):
+        missing = total - Post.objects.count()
+        if missing > 0:
+            _mixer.cycle(missing).blend(Post, author=user, group=group)
+    return grow
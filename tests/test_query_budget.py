@@ -0,0 +1,73 @@
+import pytest
+from about import urls as about_urls
+from django.contrib.auth.tokens import default_token_generator
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from posts import urls as posts_urls
+from users import urls as users_urls
+
+from tests.fixtures.fixture_queries import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+PAGE_SIZES = (1, 5, 10, 25)
+
+
+def url_names():
+    for module in (posts_urls, users_urls, about_urls):
+        for pattern in module.urlpatterns:
+            yield f'{module.app_name}:{pattern.name}'
+
+
+def url_kwargs(url_name, user, group):
+    post = user.posts.first()
+    values = {
+        'post_id': post.pk,
+        'username': user.username,
+        'slug': group.slug,
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    }
+    pattern = {
+        f'{module.app_name}:{pattern.name}': pattern
+        for module in (posts_urls, users_urls, about_urls)
+        for pattern in module.urlpatterns
+    }[url_name]
+    return {
+        name: values[name] for name in pattern.pattern.converters
+    }
+
+
+def url_params(url_name, user):
+    if url_name == 'posts:search':
+        first_post = user.posts.earliest('pub_date')
+        return {'q': first_post.text.split()[0]}
+    return None
+
+
+class TestQueryBudget:
+
+    @pytest.mark.parametrize('as_user', [False, True], ids=['guest', 'user'])
+    @pytest.mark.parametrize('url_name', list(url_names()))
+    def test_queries_do_not_grow_with_posts(self, client, user, group,
+                                            grow_posts, count_queries,
+                                            url_name, as_user):
+        counts = []
+        for size in PAGE_SIZES:
+            grow_posts(size)
+            if as_user:
+                client.force_login(user)
+            url = reverse(url_name, kwargs=url_kwargs(url_name, user, group))
+            counts.append(
+                count_queries(client, url, url_params(url_name, user))
+            )
+            client.logout()
+        assert len(set(counts)) == 1, (
+            f'Число запросов на странице `{url_name}` растет вместе с '
+            f'числом постов {PAGE_SIZES}: {counts}. Похоже на N+1.'
+        )
+
+    @query_budget(3)
+    def test_index_budget(self, client, few_posts_with_group):
+        client.get(reverse('posts:index'))
@@ -0,0 +1,232 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+# Сколько кусков потокового ответа поток пула кладет вперед, пока
+# клиент не забрал предыдущие.
+STREAM_BUFFER = 4
+
+
+class Disconnected(Exception):
+    """Клиент ушел, пока поток пула отдавал потоковый ответ."""
+
+
+class ResponseChannel:
+    """Сообщения ответа из потока пула в event loop.
+
+    Потоковый ответ кладет кусок, только пока в очереди меньше
+    STREAM_BUFFER неотправленных, и прерывается, когда клиент ушел.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.messages = asyncio.Queue()
+        self.free = threading.Semaphore(STREAM_BUFFER)
+        self.disconnected = threading.Event()
+
+    def emit(self, message, wait=False):
+        """Из потока пула: передать сообщение ответа в event loop."""
+        if wait:
+            self.free.acquire()
+            if self.disconnected.is_set():
+                raise Disconnected
+        self.loop.call_soon_threadsafe(self.messages.put_nowait, message)
+
+    def disconnect(self):
+        """Из event loop: клиент ушел, разбудить ждущий поток пула."""
+        self.disconnected.set()
+        # Semaphore.release(n) появился только в Python 3.9.
+        for _ in range(STREAM_BUFFER):
+            self.free.release()
+
+
+class WSGIToASGI:
+    """ASGI-приложение поверх обычного WSGI-обработчика Django.
+
+    Django 2.2 не умеет асинхронные view, поэтому запрос целиком, со всеми
+    запросами к базе и отрисовкой, выполняется в ограниченном пуле потоков.
+    Event loop принимает тело запроса и отдает ответ: обычный ответ
+    собирается в потоке целиком, и медленный клиент поток не держит.
+    Потоковый ответ (StreamingHttpResponse) уходит кусками по мере
+    готовности; его итерация остается в одном потоке вместе с соединением
+    с базой и ждет клиента, если тот отстал на STREAM_BUFFER кусков.
+    Потоков и соединений с базой не больше ASGI_THREADS, сколько бы
+    запросов ни ждало.
+    """
+
+    def __init__(self, wsgi_application=None, max_workers=None):
+        self.wsgi_application = wsgi_application or WSGIHandler()
+        self.executor = ThreadPoolExecutor(
+            max_workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        channel = ResponseChannel(loop)
+        task = loop.run_in_executor(
+            self.executor, self.run_wsgi, build_environ(scope, body),
+            channel.emit,
+        )
+        watcher = asyncio.ensure_future(
+            self.wait_disconnect(receive, channel.disconnect)
+        )
+        try:
+            while True:
+                message = await channel.messages.get()
+                if message is None:
+                    break
+                # После http.disconnect сервер отправку уже не примет.
+                if not channel.disconnected.is_set():
+                    await send(message)
+                channel.free.release()
+        except BaseException:
+            channel.disconnect()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        finally:
+            watcher.cancel()
+            body.close()
+        try:
+            await task
+        except Disconnected:
+            pass
+
+    async def wait_disconnect(self, receive, on_disconnect):
+        """Ждать ухода клиента: сервер, например uvicorn, сообщает о нем
+        через receive(), а отправку после него молча пропускает."""
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                on_disconnect()
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса в файле; None, если клиент ушел не дождавшись."""
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b'
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                return body
+
+    def run_wsgi(self, environ, emit):
+        """Выполняется в пуле: отдает сообщения ответа через emit.
+
+        Обычный ответ собирается целиком до отправки, потоковый
+        отправляется по кускам. В конце всегда отдается None.
+        """
+        response = {}
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        def start():
+            if not started:
+                started.append(True)
+                emit({
+                    'type': 'http.response.start',
+                    'status': response['status'],
+                    'headers': response['headers'],
+                })
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                streaming = getattr(result, 'streaming', False)
+                for chunk in result if streaming else list(result):
+                    if chunk:
+                        start()
+                        emit({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        }, wait=streaming)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            start()
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            emit(None)
+
+
+def build_environ(scope, body):
+    """WSGI environ по ASGI scope, как его строит wsgiref."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    # В ASGI путь включает root_path, в WSGI он вынесен в SCRIPT_NAME.
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        # WSGI передает пути байтами в latin-1, ASGI - уже строкой.
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    # Тело уже прочитано целиком, в том числе присланное без длины.
+    body.seek(0, 2)
+    environ['CONTENT_LENGTH'] = str(body.tell())
+    body.seek(0)
+    return environ
@@ -0,0 +1,53 @@
+import random
+import threading
+
+from django.conf import settings
+
+# Приложения, чьи таблицы можно читать с реплик. Сессии и кеш в базе
+# всегда читаются с основной: они пишутся на каждом запросе.
+REPLICA_APPS = frozenset({'posts', 'auth'})
+PRIMARY_COOKIE = 'yatube_primary'
+
+_local = threading.local()
+
+
+def start_request():
+    _local.replica = None
+    _local.wrote = False
+
+
+def finish_request():
+    _local.replica = None
+
+
+def use_replica():
+    """Читать до конца запроса с одной случайной реплики."""
+    _local.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+def request_wrote():
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтения лент идут на реплику, выбранную middleware, запись - в default.
+
+    Вне запроса к ленте (команды, формы, админка) все читается
+    с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICA_APPS:
+            return None
+        return getattr(_local, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS:
+            _local.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from core import perf
+
+
+def format_ms(value):
+    if value is None:
+        return f'>{perf.WALL_BUCKETS_MS[-1]}'
+    return f'{value:.0f}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает собранные middleware запросы к базе и время '
+        'по каждому view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Очистить собранную статистику.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            perf.reset_all()
+            self.stdout.write('Статистика очищена.')
+            return
+        rows = perf.report(perf.collect())
+        if not rows:
+            self.stdout.write('Статистики пока нет.')
+            return
+        self.stdout.write(
+            f'{"view":<24} {"запросов":>8} {"SQL":>5} {"SQL, мс":>8} '
+            f'{"шаблоны, мс":>11} {"всего, мс":>9} {"p50":>6} {"p95":>6}'
+        )
+        for row in rows:
+            line = (
+                f'{row["view"]:<24} {row["requests"]:>8} '
+                f'{row["queries"]:>5.1f} {row["sql_ms"]:>8.1f} '
+                f'{row["template_ms"]:>11.1f} {row["wall_ms"]:>9.1f} '
+                f'{format_ms(row["wall_p50_ms"]):>6} '
+                f'{format_ms(row["wall_p95_ms"]):>6}'
+            )
+            if row['n_plus_one']:
+                line = self.style.WARNING(
+                    f'{line}  N+1: запросы растут с размером страницы'
+                )
+            self.stdout.write(line)
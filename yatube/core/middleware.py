@@ -0,0 +1,81 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, perf
+
+
+class PerfStatsMiddleware:
+    """Собирает по каждому view число и время SQL, шаблонов и всего ответа.
+
+    Стоит первым в MIDDLEWARE, чтобы время включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = perf.RequestStats()
+        perf.start_request(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            perf.finish_request()
+        match = request.resolver_match
+        if match is not None:
+            perf.registry.record(
+                match.view_name, stats, time.perf_counter() - started
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет чтения лент на реплики, а только что писавшего - на основную.
+
+    После записи ставится короткоживущая кука: пока она есть, этот
+    пользователь читает с основной базы и видит свои изменения, даже если
+    реплики отстают. Гостевые страницы из кеша лент тоже отрисовываются
+    по основной базе, иначе в кеш под свежей версией попадет отставшая
+    реплика; попадания в кеш базу не читают вовсе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.start_request()
+        try:
+            response = self.get_response(request)
+            wrote = db_router.request_wrote()
+        finally:
+            db_router.finish_request()
+        if wrote:
+            response.set_cookie(
+                db_router.PRIMARY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in ('GET', 'HEAD')
+            and db_router.PRIMARY_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name
+            in settings.REPLICA_READ_VIEWS
+            and not (
+                getattr(view_func, 'anonymous_page_cache', False)
+                and not request.user.is_authenticated
+            )
+        ):
+            db_router.use_replica()
@@ -0,0 +1,233 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.cache import cache
+
+WALL_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+FLUSH_INTERVAL = 30
+SNAPSHOT_TTL = FLUSH_INTERVAL * 10
+SLOTS_KEY = 'core:perf:slots'
+N_PLUS_ONE_SLOPE = 0.5
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Счетчики одного запроса: SQL, шаблоны и размер страницы."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.items = None
+        self.rendering = False
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+    def record_render(self, elapsed, context):
+        self.template_time += elapsed
+        page = context.get('page_obj') if isinstance(context, dict) else None
+        if page is not None and self.items is None:
+            self.items = len(page.object_list)
+
+
+def start_request(stats):
+    _local.stats = stats
+
+
+def finish_request():
+    _local.stats = None
+
+
+def current_request():
+    return getattr(_local, 'stats', None)
+
+
+def empty_view():
+    return {
+        'requests': 0,
+        'queries': 0,
+        'sql_time': 0.0,
+        'template_time': 0.0,
+        'wall_time': 0.0,
+        'wall_buckets': [0] * (len(WALL_BUCKETS_MS) + 1),
+        'by_items': {},
+    }
+
+
+def merge_view(total, view):
+    for field in ('requests', 'queries', 'sql_time', 'template_time',
+                  'wall_time'):
+        total[field] += view[field]
+    total['wall_buckets'] = [
+        left + right
+        for left, right in zip(total['wall_buckets'], view['wall_buckets'])
+    ]
+    for items, (requests, queries) in view['by_items'].items():
+        known = total['by_items'].setdefault(items, [0, 0])
+        known[0] += requests
+        known[1] += queries
+
+
+def bucket_index(wall_ms):
+    for index, bound in enumerate(WALL_BUCKETS_MS):
+        if wall_ms <= bound:
+            return index
+    return len(WALL_BUCKETS_MS)
+
+
+def slot_key(slot):
+    return f'core:perf:slot:{slot}'
+
+
+def slot_keys():
+    return [
+        slot_key(slot) for slot in range(1, (cache.get(SLOTS_KEY) or 0) + 1)
+    ]
+
+
+def claim_slot(entry):
+    """Занять свободный номер под снимок процесса.
+
+    Номер занимается через cache.add, поэтому два процесса не получат
+    один и тот же; номера умерших процессов освобождаются по SNAPSHOT_TTL.
+    """
+    for key in slot_keys():
+        if cache.add(key, entry, SNAPSHOT_TTL):
+            return key
+    cache.add(SLOTS_KEY, 0, None)
+    while True:
+        key = slot_key(cache.incr(SLOTS_KEY))
+        if cache.add(key, entry, SNAPSHOT_TTL):
+            return key
+
+
+class Registry:
+    """Гистограммы по view в памяти процесса с периодическим сбросом в кеш.
+
+    Через кеш снимки всех процессов видны staff-странице и perf_report.
+    Снимок живет SNAPSHOT_TTL и продлевается каждым сбросом.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.flushed_at = time.monotonic()
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.key = None
+
+    def record(self, view_name, stats, wall_time):
+        with self.lock:
+            view = self.views.setdefault(view_name, empty_view())
+            view['requests'] += 1
+            view['queries'] += stats.queries
+            view['sql_time'] += stats.sql_time
+            view['template_time'] += stats.template_time
+            view['wall_time'] += wall_time
+            view['wall_buckets'][bucket_index(wall_time * 1000)] += 1
+            if stats.items is not None:
+                known = view['by_items'].setdefault(stats.items, [0, 0])
+                known[0] += 1
+                known[1] += stats.queries
+            flush = time.monotonic() - self.flushed_at >= FLUSH_INTERVAL
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {}
+            for view_name, view in self.views.items():
+                snapshot[view_name] = empty_view()
+                merge_view(snapshot[view_name], view)
+            return snapshot
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+        entry = {'owner': self.owner, 'views': self.snapshot()}
+        held = cache.get(self.key) if self.key else None
+        if held is not None and held['owner'] == self.owner:
+            cache.set(self.key, entry, SNAPSHOT_TTL)
+        else:
+            self.key = claim_slot(entry)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+registry = Registry()
+
+
+def collect():
+    """Сумма снимков всех процессов, свой процесс берется свежим."""
+    registry.flush()
+    total = {}
+    # Истекшие снимки get_many просто не вернет.
+    for entry in cache.get_many(slot_keys()).values():
+        for view_name, view in entry['views'].items():
+            merge_view(total.setdefault(view_name, empty_view()), view)
+    return total
+
+
+def reset_all():
+    registry.reset()
+    cache.delete_many(slot_keys())
+    cache.delete(SLOTS_KEY)
+
+
+def percentile(buckets, share):
+    """Верхняя граница корзины с долей share запросов; None - выше всех."""
+    total = sum(buckets)
+    if not total:
+        return 0
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen >= share * total:
+            break
+    if index < len(WALL_BUCKETS_MS):
+        return WALL_BUCKETS_MS[index]
+    return None
+
+
+def queries_grow_with_items(by_items):
+    """Число запросов растет с размером страницы: похоже на N+1."""
+    points = sorted(
+        (int(items), queries / requests)
+        for items, (requests, queries) in by_items.items()
+    )
+    if len(points) < 2 or points[0][0] == points[-1][0]:
+        return False
+    (first_items, first_queries), (last_items, last_queries) = (
+        points[0], points[-1]
+    )
+    slope = (last_queries - first_queries) / (last_items - first_items)
+    return slope >= N_PLUS_ONE_SLOPE
+
+
+def report(views):
+    rows = []
+    for view_name, view in views.items():
+        requests = view['requests'] or 1
+        rows.append({
+            'view': view_name,
+            'requests': view['requests'],
+            'queries': view['queries'] / requests,
+            'sql_ms': view['sql_time'] / requests * 1000,
+            'template_ms': view['template_time'] / requests * 1000,
+            'wall_ms': view['wall_time'] / requests * 1000,
+            'wall_p50_ms': percentile(view['wall_buckets'], 0.5),
+            'wall_p95_ms': percentile(view['wall_buckets'], 0.95),
+            'n_plus_one': queries_grow_with_items(view['by_items']),
+        })
+    return sorted(
+        rows, key=lambda row: row['wall_ms'] * row['requests'], reverse=True
+    )
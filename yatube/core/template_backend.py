@@ -0,0 +1,39 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+from . import perf
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = perf.current_request()
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.rendering = False
+            stats.record_render(time.perf_counter() - started, context)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, который засекает время отрисовки для PerfStats.
+
+    Сигнал template_rendered Django шлет только под тестовым раннером,
+    поэтому время берется здесь. Вложенные render_to_string (карточки
+    постов) входят во внешнюю отрисовку и отдельно не считаются.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,309 @@
+import asyncio
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.middleware.csrf import _get_new_csrf_token
+from django.test import Client, SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import STREAM_BUFFER, WSGIToASGI, build_environ
+from posts.models import Post, User
+
+
+def receiver(*messages):
+    """receive() как у сервера: после тела запроса ждет ухода клиента."""
+    incoming = list(messages)
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        await asyncio.Event().wait()
+
+    return receive
+
+
+def call(application, method, path, body=b'', headers=(), query=b''):
+    """Один HTTP-запрос к ASGI-приложению; ответ как (статус, заголовки,
+    тело) или None, если ответа не было."""
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 40000),
+    }
+    receive = receiver(
+        {'type': 'http.request', 'body': body[:1], 'more_body': True},
+        {'type': 'http.request', 'body': body[1:]},
+    )
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await application(scope, receive, send)
+
+    asyncio.run(run())
+    if not sent:
+        return None
+    return (
+        sent[0]['status'],
+        sent[0]['headers'],
+        b''.join(message['body'] for message in sent[1:]),
+    )
+
+
+class ASGIViewsTest(TransactionTestCase):
+    """Запросы через yatube.asgi выполняются в потоках пула."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост через ASGI', author=self.user)
+        self.application = WSGIToASGI(max_workers=2)
+
+    def tearDown(self):
+        self.application.executor.shutdown()
+
+    def test_feeds_are_served(self):
+        """Ленты и страница поста отдаются так же, как через WSGI."""
+        post = Post.objects.get()
+        for address in (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(address=address):
+                status, _, body = call(self.application, 'GET', address)
+                self.assertEqual(status, 200)
+                self.assertIn('Пост через ASGI', body.decode())
+
+    def test_form_post_with_session_and_csrf(self):
+        """Тело формы, куки и CSRF доходят до view."""
+        client = Client()
+        client.force_login(self.user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        token = _get_new_csrf_token()
+        status, headers, _ = call(
+            self.application, 'POST', reverse('posts:create'),
+            body='text=Новый+пост'.encode(),
+            headers=[
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'cookie', f'{settings.CSRF_COOKIE_NAME}={token}'.encode()),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'
+                 .encode()),
+                (b'x-csrftoken', token.encode()),
+            ],
+        )
+        self.assertEqual(status, 302)
+        self.assertIn(
+            (b'location', reverse(
+                'posts:profile', kwargs={'username': 'author'}
+            ).encode()),
+            headers,
+        )
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+
+
+class ThreadPoolTest(SimpleTestCase):
+    def test_concurrency_is_bounded(self):
+        """Одновременно в WSGI-приложении не больше max_workers запросов."""
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def wsgi_application(environ, start_response):
+            with lock:
+                running.append(environ['PATH_INFO'])
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(environ['PATH_INFO'])
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['PATH_INFO'].encode()]
+
+        application = WSGIToASGI(wsgi_application, max_workers=3)
+        scope = {'type': 'http', 'method': 'GET', 'headers': []}
+        answers = {}
+
+        async def request(number):
+            receive = receiver({'type': 'http.request'})
+
+            async def send(message):
+                answers.setdefault(number, []).append(message)
+
+            await application(
+                {**scope, 'path': f'/{number}/'}, receive, send
+            )
+
+        async def run():
+            await asyncio.gather(*(request(number) for number in range(12)))
+
+        asyncio.run(run())
+        application.executor.shutdown()
+        self.assertEqual(max(peak), 3)
+        self.assertEqual(len(answers), 12)
+        self.assertEqual(answers[5][1]['body'], b'/5/')
+
+    def test_disconnect_before_body_skips_application(self):
+        """Клиент ушел до конца тела - приложение не вызывается."""
+        calls = []
+        application = WSGIToASGI(
+            lambda environ, start_response: calls.append(environ),
+            max_workers=1,
+        )
+        receive = receiver(
+            {'type': 'http.request', 'body': b'a', 'more_body': True},
+            {'type': 'http.disconnect'},
+        )
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(
+            {'type': 'http', 'method': 'POST', 'path': '/', 'headers': []},
+            receive, send,
+        ))
+        application.executor.shutdown()
+        self.assertEqual((calls, sent), ([], []))
+
+    def test_streaming_response_is_sent_as_it_goes(self):
+        """Кусок потокового ответа уходит клиенту, не дожидаясь следующих."""
+        first_sent = threading.Event()
+
+        class Streaming:
+            streaming = True
+
+            def __iter__(self):
+                yield b'first'
+                yield b'second' if first_sent.wait(5) else b'buffered'
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Streaming()
+
+        application = WSGIToASGI(wsgi_application, max_workers=1)
+        receive = receiver({'type': 'http.request'})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if message.get('body') == b'first':
+                first_sent.set()
+
+        asyncio.run(application(
+            {'type': 'http', 'method': 'GET', 'path': '/', 'headers': []},
+            receive, send,
+        ))
+        application.executor.shutdown()
+        self.assertEqual(
+            [message.get('body') for message in sent[1:]],
+            [b'first', b'second', b''],
+        )
+
+    def test_disconnect_stops_streaming(self):
+        """Клиент ушел посреди потокового ответа - итерация прерывается,
+        поток пула освобождается."""
+        closed = threading.Event()
+
+        class Endless:
+            streaming = True
+
+            def __iter__(self):
+                while True:
+                    yield b'chunk'
+
+            def close(self):
+                closed.set()
+
+        application = WSGIToASGI(
+            lambda environ, start_response: (
+                start_response('200 OK', []) or Endless()
+            ),
+            max_workers=1,
+        )
+        receive = receiver({'type': 'http.request'})
+
+        async def send(message):
+            if message.get('body'):
+                raise ConnectionResetError
+
+        with self.assertRaises(ConnectionResetError):
+            asyncio.run(application(
+                {'type': 'http', 'method': 'GET', 'path': '/',
+                 'headers': []},
+                receive, send,
+            ))
+        application.executor.shutdown()
+        self.assertTrue(closed.is_set())
+
+    def test_disconnect_reported_by_receive_stops_streaming(self):
+        """Сервер сообщил об уходе клиента через receive(), а отправку
+        молча пропускает - итерация все равно прерывается."""
+        closed = threading.Event()
+
+        class Endless:
+            streaming = True
+
+            def __iter__(self):
+                while True:
+                    yield b'chunk'
+
+            def close(self):
+                closed.set()
+
+        application = WSGIToASGI(
+            lambda environ, start_response: (
+                start_response('200 OK', []) or Endless()
+            ),
+            max_workers=1,
+        )
+        sent = []
+
+        async def run():
+            gone = asyncio.Event()
+            incoming = [{'type': 'http.request'}]
+
+            async def receive():
+                if incoming:
+                    return incoming.pop()
+                await gone.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if message.get('body'):
+                    gone.set()
+
+            await asyncio.wait_for(application(
+                {'type': 'http', 'method': 'GET', 'path': '/',
+                 'headers': []},
+                receive, send,
+            ), 5)
+
+        asyncio.run(run())
+        application.executor.shutdown()
+        self.assertTrue(closed.is_set())
+        # Старт ответа и куски, уже лежавшие в очереди к уходу клиента.
+        self.assertLessEqual(len(sent), 2 + STREAM_BUFFER)
+
+    def test_root_path_is_moved_to_script_name(self):
+        """Префикс root_path уходит из PATH_INFO в SCRIPT_NAME."""
+        environ = build_environ(
+            {
+                'method': 'GET',
+                'path': '/yatube/group/тест/',
+                'root_path': '/yatube',
+            },
+            tempfile.SpooledTemporaryFile(),
+        )
+        self.assertEqual(environ['SCRIPT_NAME'], '/yatube')
+        self.assertEqual(
+            environ['PATH_INFO'],
+            '/group/тест/'.encode('utf-8').decode('latin-1'),
+        )
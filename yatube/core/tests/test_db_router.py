@@ -0,0 +1,138 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.db_router import PRIMARY_COOKIE
+from posts.models import Group, Post, Profile, User
+
+REPLICA = 'replica'
+
+
+class ReplicaRoutingTest(TestCase):
+    """Основная база - тестовая, реплика - отдельный файл SQLite.
+
+    Репликации между ними нет, поэтому по содержимому страницы видно,
+    из какой базы она прочитана.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.tmp_dir.name, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults(REPLICA)
+        connections.prepare_test_settings(REPLICA)
+        cls.replicas = override_settings(DATABASE_REPLICAS=[REPLICA])
+        cls.replicas.enable()
+        call_command('migrate', database=REPLICA, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.replicas.disable()
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        cls.tmp_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(
+            text='Пост из default', author=user, group=group
+        )
+        # Копия тех же строк без сигналов, отличается только текст поста.
+        post.text = f'Пост из {REPLICA}'
+        group.posts_count = 1
+        for model, rows in (
+            (User, [user]),
+            (Group, [group]),
+            (Profile, [Profile(user=user, posts_count=1)]),
+            (Post, [post]),
+        ):
+            model.objects.using(REPLICA).bulk_create(rows)
+        self.client = Client()
+        self.client.force_login(user)
+        self.post = post
+
+    def tearDown(self):
+        for model in (Post, Profile, Group, User):
+            model.objects.using(REPLICA).all().delete()
+
+    def test_feeds_are_read_from_replica(self):
+        """Ленты и страница поста читаются с реплики."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, f'Пост из {REPLICA}')
+                self.assertNotContains(response, 'Пост из default')
+
+    def test_guest_page_cache_is_filled_from_primary(self):
+        """Кешируемые страницы гостя не читают отстающую реплику, иначе
+        ее строки легли бы в кеш под новой версией ленты."""
+        guest = Client()
+        for address in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        ):
+            with self.subTest(address=address):
+                for _ in range(2):
+                    response = guest.get(address)
+                    self.assertContains(response, 'Пост из default')
+                    self.assertNotContains(response, f'Пост из {REPLICA}')
+        response = guest.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, f'Пост из {REPLICA}')
+
+    def test_other_views_read_primary(self):
+        """Остальные страницы читают с основной базы."""
+        response = self.client.get(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(response.context['form'].instance.text,
+                         'Пост из default')
+
+    def test_writer_reads_own_writes(self):
+        """После записи ставится кука, и ленты читаются с основной базы."""
+        response = self.client.post(
+            reverse('posts:create'), {'text': 'Свежий пост'}
+        )
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertTrue(Post.objects.using('default').filter(
+            text='Свежий пост'
+        ).exists())
+        self.assertFalse(Post.objects.using(REPLICA).filter(
+            text='Свежий пост'
+        ).exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_reads_do_not_pin_to_primary(self):
+        """Чтение ленты не ставит куку основной базы."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_without_replicas_everything_reads_primary(self):
+        """Без реплик в настройках ленты читаются с основной базы."""
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из default')
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import perf
+from posts.models import Post, User
+
+
+class PerfStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        perf.registry.reset()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_view_stats_are_recorded(self):
+        """Для view копятся запросы, время SQL, шаблонов и ответа."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.get(reverse('posts:index'))
+        view = perf.registry.snapshot()['posts:index']
+        self.assertEqual(view['requests'], 2)
+        self.assertGreater(view['queries'], 0)
+        self.assertGreater(view['sql_time'], 0)
+        self.assertGreater(view['template_time'], 0)
+        self.assertGreaterEqual(view['wall_time'], view['template_time'])
+        self.assertEqual(sum(view['wall_buckets']), 2)
+        self.assertEqual(list(view['by_items']), [1])
+
+    def test_n_plus_one_is_flagged(self):
+        """Рост числа запросов вместе с размером страницы помечается."""
+        self.assertTrue(perf.queries_grow_with_items(
+            {1: [1, 4], 10: [1, 13]}
+        ))
+        self.assertFalse(perf.queries_grow_with_items(
+            {1: [2, 8], 10: [1, 4]}
+        ))
+        self.assertFalse(perf.queries_grow_with_items({10: [1, 40]}))
+
+    def test_percentile(self):
+        """Перцентиль берется по границам корзин гистограммы."""
+        buckets = [0] * (len(perf.WALL_BUCKETS_MS) + 1)
+        buckets[1], buckets[-1] = 19, 1
+        self.assertEqual(perf.percentile(buckets, 0.5), 10)
+        self.assertIsNone(perf.percentile(buckets, 1))
+
+    def test_staff_endpoint(self):
+        """Сводка доступна только персоналу."""
+        address = reverse('core:perf_stats')
+        self.assertEqual(
+            self.authorized_client.get(address).status_code, 302
+        )
+        self.authorized_client.get(reverse('posts:index'))
+        client = Client()
+        client.force_login(self.staff)
+        views = {row['view'] for row in client.get(address).json()['views']}
+        self.assertIn('posts:index', views)
+
+    def test_perf_report_command(self):
+        """perf_report печатает сводку и умеет ее очищать."""
+        self.authorized_client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('perf_report', stdout=out)
+        self.assertIn('posts:index', out.getvalue())
+        call_command('perf_report', '--reset', stdout=StringIO())
+        out = StringIO()
+        call_command('perf_report', stdout=out)
+        self.assertIn('Статистики пока нет', out.getvalue())
+
+    def test_processes_share_slots(self):
+        """Каждый процесс пишет свой снимок; истекший снимок не читается,
+        а его номер достается новому процессу."""
+        first, second = perf.Registry(), perf.Registry()
+        first.owner, second.owner = 'web:1', 'web:2'
+        stats = perf.RequestStats()
+        first.record('first', stats, 0.01)
+        second.record('second', stats, 0.01)
+        first.flush()
+        second.flush()
+        self.assertNotEqual(first.key, second.key)
+        self.assertEqual(
+            {'first', 'second'} - set(perf.collect()), set()
+        )
+        cache.delete(first.key)
+        self.assertNotIn('first', perf.collect())
+        third = perf.Registry()
+        third.owner = 'web:3'
+        third.flush()
+        self.assertEqual(third.key, first.key)
+        first.flush()
+        self.assertNotIn(first.key, (second.key, third.key))
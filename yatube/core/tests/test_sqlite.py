@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, override_settings
+
+WAL_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+READERS = 4
+WRITE_HOLD = 0.5
+BUSY_TIMEOUT = 0.05
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.connections = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(tmp_dir.name, 'db.sqlite3'),
+            'OPTIONS': {'timeout': BUSY_TIMEOUT},
+        }})
+        self.addCleanup(self.connections.close_all)
+
+    def pragma(self, name):
+        with self.connections['default'].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def reads_during_write(self):
+        """Сколько чтений прошло и сорвалось, пока писатель держит запись."""
+        with self.connections['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+            cursor.execute('INSERT INTO item VALUES (1)')
+        writing, written = threading.Event(), threading.Event()
+        outcomes = {'reads': 0, 'blocked': 0}
+        lock = threading.Lock()
+
+        def write():
+            connection = self.connections['default']
+            with connection.cursor() as cursor:
+                cursor.execute('BEGIN EXCLUSIVE')
+                cursor.execute('INSERT INTO item VALUES (2)')
+                writing.set()
+                time.sleep(WRITE_HOLD)
+                written.set()
+                cursor.execute('COMMIT')
+            connection.close()
+
+        def read():
+            connection = self.connections['default']
+            writing.wait()
+            while not written.is_set():
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM item')
+                        cursor.fetchone()
+                    outcome = 'reads'
+                except OperationalError:
+                    outcome = 'blocked'
+                if written.is_set():
+                    # Попытка могла дождаться COMMIT, она не в счет.
+                    break
+                with lock:
+                    outcomes[outcome] += 1
+            connection.close()
+
+        threads = [threading.Thread(target=write)] + [
+            threading.Thread(target=read) for _ in range(READERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes['reads'], outcomes['blocked']
+
+    @override_settings(SQLITE_PRAGMAS=WAL_PRAGMAS)
+    def test_pragmas_are_applied_on_connect(self):
+        """Каждое новое соединение получает настройки из SQLITE_PRAGMAS."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(self.pragma('mmap_size'), 256 * 1024 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS=WAL_PRAGMAS)
+    def test_readers_are_not_blocked_by_writer_in_wal(self):
+        """В WAL читатели работают, пока открыта транзакция записи."""
+        reads, blocked = self.reads_during_write()
+        self.assertEqual(blocked, 0)
+        self.assertGreater(reads, READERS * 10)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_readers_wait_for_writer_without_wal(self):
+        """С журналом отката читатели стоят до конца записи."""
+        reads, blocked = self.reads_during_write()
+        self.assertEqual(reads, 0)
+        self.assertGreater(blocked, 0)
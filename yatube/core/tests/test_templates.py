@@ -0,0 +1,64 @@
+from copy import deepcopy
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+def cached_templates():
+    """TEMPLATES проекта с загрузчиками, как при YATUBE_DEBUG=0."""
+    templates = deepcopy(settings.TEMPLATES)
+    options = templates[0]['OPTIONS']
+    if options['loaders'][0][0] != 'django.template.loaders.cached.Loader':
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', options['loaders']),
+        ]
+    return templates
+
+
+class CachedTemplatesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(10)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def compiled_templates(self, address):
+        """Сколько шаблонов разобрано при отрисовке без кеша карточек."""
+        cache.clear()
+        with mock.patch.object(
+            Template, 'compile_nodelist', autospec=True,
+            side_effect=Template.compile_nodelist,
+        ) as compile_nodelist:
+            response = self.client.get(address)
+        self.assertEqual(response.status_code, 200)
+        return compile_nodelist.call_count
+
+    def test_templates_are_parsed_once(self):
+        """С кеширующим загрузчиком base, include и карточки не разбираются
+        повторно, даже когда карточки рисуются заново."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        with override_settings(TEMPLATES=cached_templates()):
+            for address in addresses:
+                with self.subTest(address=address):
+                    self.assertGreater(self.compiled_templates(address), 0)
+                    self.assertEqual(self.compiled_templates(address), 0)
@@ -0,0 +1,295 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import page_cache
+from .models import ActivityBucket, ActivityTotal, Post
+from .timeline import batches
+
+SIDEBAR_KEY = 'posts:activity:sidebar'
+SIDEBAR_TIMEOUT = 60 * 60 * 24
+OWNERS = ('group_id', 'author_id')
+BATCH = 500
+
+
+def window_start(now):
+    """Полночь первого дня окна: сегодня и ACTIVITY_WINDOW_DAYS - 1 до него."""
+    today = now.astimezone(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return today - timedelta(days=settings.ACTIVITY_WINDOW_DAYS - 1)
+
+
+def owners(row):
+    """Группа и автор поста или строки values() как условия для корзин."""
+    return [
+        {field: row[field]} for field in OWNERS if row[field] is not None
+    ]
+
+
+def increment(model, lookup, delta):
+    """Прибавить delta к posts строки lookup, создав ее при необходимости."""
+    rows = model.objects.filter(**lookup)
+    if rows.update(posts=F('posts') + delta):
+        return
+    _, created = model.objects.get_or_create(
+        **lookup, defaults={'posts': delta}
+    )
+    if not created:
+        rows.update(posts=F('posts') + delta)
+
+
+def post_owners(post, values=None):
+    """Группа и автор поста; values подменяют поля, например значениями
+    из Post.loaded_values."""
+    values = values or {}
+    return owners({
+        field: values.get(field, getattr(post, field)) for field in OWNERS
+    })
+
+
+def bucket_starts(pub_date):
+    """Начала минутной, часовой и дневной корзин, куда мог попасть пост."""
+    minute = pub_date.astimezone(timezone.utc).replace(
+        second=0, microsecond=0
+    )
+    return (
+        (ActivityBucket.MINUTE, minute),
+        (ActivityBucket.HOUR, minute.replace(minute=0)),
+        (ActivityBucket.DAY, minute.replace(hour=0, minute=0)),
+    )
+
+
+def add_post(owner, pub_date):
+    (size, start), *_ = bucket_starts(pub_date)
+    increment(ActivityBucket, {**owner, 'size': size, 'start': start}, 1)
+    increment(ActivityTotal, owner, 1)
+
+
+def take_post(owner, pub_date):
+    """Вычесть пост из корзины, где он учтен сейчас: минуты к этому
+    времени могли свернуться в час, а часы - в день."""
+    for size, start in bucket_starts(pub_date):
+        if ActivityBucket.objects.filter(
+            **owner, size=size, start=start, posts__gt=0
+        ).update(posts=F('posts') - 1):
+            break
+    ActivityTotal.objects.filter(**owner, posts__gt=0).update(
+        posts=F('posts') - 1
+    )
+
+
+def change_post(pub_date, changed, delta):
+    """Прибавить или вычесть пост у групп и авторов changed."""
+    if not changed or pub_date < window_start(timezone.now()):
+        return
+    for owner in changed:
+        if delta > 0:
+            add_post(owner, pub_date)
+        else:
+            take_post(owner, pub_date)
+    forget_sidebar()
+
+
+def record_post(post):
+    """Учесть новый пост в минутной корзине и в суммах за окно."""
+    change_post(post.pub_date, post_owners(post), 1)
+
+
+def record_posts(posts):
+    """Учесть пачку постов без сигналов, например из import_posts:
+    по одному обновлению на корзину и на сумму."""
+    start = window_start(timezone.now())
+    buckets, totals = Counter(), Counter()
+    for post in posts:
+        if post.pub_date < start:
+            continue
+        (size, minute), *_ = bucket_starts(post.pub_date)
+        for owner in post_owners(post):
+            owner = next(iter(owner.items()))
+            buckets[owner, size, minute] += 1
+            totals[owner] += 1
+    for ((field, owner_id), size, minute), count in buckets.items():
+        increment(ActivityBucket, {
+            field: owner_id, 'size': size, 'start': minute,
+        }, count)
+    for (field, owner_id), count in totals.items():
+        increment(ActivityTotal, {field: owner_id}, count)
+    if totals:
+        forget_sidebar()
+
+
+def discard_post(post):
+    """Вычесть удаленный пост из корзин и сумм."""
+    change_post(post.pub_date, post_owners(post), -1)
+
+
+def move_post(post, loaded_values):
+    """Перенести пост, которому сменили группу или автора."""
+    current = post_owners(post)
+    previous = post_owners(post, loaded_values)
+    change_post(
+        post.pub_date,
+        [owner for owner in previous if owner not in current],
+        -1,
+    )
+    change_post(
+        post.pub_date,
+        [owner for owner in current if owner not in previous],
+        1,
+    )
+
+
+def compact(size, into, before):
+    """Свернуть корзины size, начатые раньше before, в корзины into.
+
+    Возвращает число затронутых корзин into.
+    """
+    old = ActivityBucket.objects.filter(size=size, start__lt=before)
+    merged = list(
+        old.order_by()
+        .annotate(period=Trunc('start', into, tzinfo=timezone.utc))
+        .values(*OWNERS, 'period')
+        .annotate(total=Sum('posts'))
+    )
+    old.delete()
+    # Корзины, опустевшие после удаления постов, пропадают при свертке.
+    merged = [row for row in merged if row['total']]
+    for row in merged:
+        for owner in owners(row):
+            increment(ActivityBucket, {
+                **owner, 'size': into, 'start': row['period'],
+            }, row['total'])
+    return len(merged)
+
+
+def recount_totals():
+    """Привести суммы за окно к оставшимся корзинам; число исправленных."""
+    changed = 0
+    for field in OWNERS:
+        actual = dict(
+            ActivityBucket.objects.filter(
+                **{f'{field}__isnull': False}, posts__gt=0
+            ).order_by().values_list(field).annotate(total=Sum('posts'))
+        )
+        stale = []
+        drifted = []
+        for total in ActivityTotal.objects.filter(
+            **{f'{field}__isnull': False}
+        ).only('pk', field, 'posts'):
+            posts = actual.pop(getattr(total, field), 0)
+            if not posts:
+                stale.append(total.pk)
+            elif posts != total.posts:
+                total.posts = posts
+                drifted.append(total)
+        for batch in batches(stale, BATCH):
+            ActivityTotal.objects.filter(pk__in=batch).delete()
+        ActivityTotal.objects.bulk_update(drifted, ['posts'], BATCH)
+        ActivityTotal.objects.bulk_create(
+            (
+                ActivityTotal(**{field: owner_id, 'posts': posts})
+                for owner_id, posts in actual.items()
+            ),
+            BATCH,
+        )
+        changed += len(stale) + len(drifted) + len(actual)
+    return changed
+
+
+def rebuild(now):
+    """Собрать часовые корзины окна заново по таблице постов."""
+    ActivityBucket.objects.all().delete()
+    recent = Post.objects.filter(pub_date__gte=window_start(now)).order_by()
+    for field in OWNERS:
+        rows = (
+            recent.filter(**{f'{field}__isnull': False})
+            .annotate(period=Trunc('pub_date', 'hour', tzinfo=timezone.utc))
+            .values(field, 'period')
+            .annotate(total=Count('pk'))
+        )
+        ActivityBucket.objects.bulk_create(
+            (
+                ActivityBucket(**{
+                    field: row[field], 'size': ActivityBucket.HOUR,
+                    'start': row['period'], 'posts': row['total'],
+                })
+                for row in rows.iterator()
+            ),
+            BATCH,
+        )
+
+
+def rollup(now=None, rebuild_window=False):
+    """Свернуть минуты прошлых часов в часы, часы до вчерашнего дня - в дни,
+    удалить корзины старше окна и пересчитать суммы.
+
+    Окно начинается с полуночи, поэтому после свертки суммы совпадают
+    с корзинами точно. Корзины сигналы держат в согласии с постами
+    при публикации, удалении и переносе в другую группу или к другому
+    автору. Суммы пересчитываются по корзинам: если пост прибавился
+    к сумме во время пересчета, ее исправит следующий запуск.
+    """
+    now = now or timezone.now()
+    this_hour = now.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+    yesterday = this_hour.replace(hour=0) - timedelta(days=1)
+    with transaction.atomic():
+        if rebuild_window:
+            rebuild(now)
+        stats = {
+            'hours': compact(
+                ActivityBucket.MINUTE, ActivityBucket.HOUR, this_hour
+            ),
+            'days': compact(
+                ActivityBucket.HOUR, ActivityBucket.DAY, yesterday
+            ),
+            'expired': ActivityBucket.objects.filter(
+                start__lt=window_start(now)
+            ).delete()[0],
+            'totals': recount_totals(),
+        }
+    forget_sidebar()
+    # Списки на главной поменялись без новых постов.
+    page_cache.bump_versions([page_cache.all_posts_scope()])
+    return stats
+
+
+def top(field):
+    return ActivityTotal.objects.filter(
+        **{f'{field}__isnull': False}
+    ).order_by('-posts', '-id')[:settings.ACTIVITY_SIDEBAR_SIZE]
+
+
+def sidebar():
+    """Популярные группы и активные авторы за окно.
+
+    Каждый список - первые ACTIVITY_SIDEBAR_SIZE строк частичного
+    индекса по -posts, результат кешируется до новой публикации.
+    """
+    lists = cache.get(SIDEBAR_KEY)
+    if lists is None:
+        lists = {
+            'trending_groups': list(top('group').values(
+                'posts', slug=F('group__slug'), title=F('group__title'),
+            )),
+            'top_authors': list(top('author').values(
+                'posts',
+                username=F('author__username'),
+                first_name=F('author__first_name'),
+                last_name=F('author__last_name'),
+            )),
+        }
+        cache.set(SIDEBAR_KEY, lists, SIDEBAR_TIMEOUT)
+    return lists
+
+
+def forget_sidebar():
+    cache.delete(SIDEBAR_KEY)
@@ -0,0 +1,70 @@
+import re
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import counts
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+CARD_VARIANTS = ('author', 'no-author')
+# Число комментариев в закешированную карточку не входит: на его месте
+# метка, которая в странице становится числом с id поста.
+COMMENTS_MARK = '<!--comments-->'
+COMMENTS_RE = re.compile(rb'(\d+)<!--comments:(\d+)-->')
+
+
+def card_key(post_id, updated, variant):
+    return f'posts:card:{variant}:{post_id}:{updated.timestamp()}'
+
+
+def render_card(post, show_author=True):
+    """Карточка поста из кеша.
+
+    Версия - время изменения поста. Число комментариев берется
+    из самого поста, поэтому комментарий карточку не сбрасывает.
+    """
+    variant = CARD_VARIANTS[not show_author]
+    key = card_key(post.pk, post.updated, variant)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(
+            CARD_TEMPLATE, {'post': post, 'show_author': show_author}
+        )
+        cache.set(key, str(html), CARD_TIMEOUT)
+    return mark_safe(html.replace(
+        COMMENTS_MARK, f'{post.comments_count}<!--comments:{post.pk}-->'
+    ))
+
+
+def forget_cards(versions):
+    """Удалить карточки по парам (id поста, время изменения)."""
+    cache.delete_many([
+        card_key(post_id, updated, variant)
+        for post_id, updated in versions
+        for variant in CARD_VARIANTS
+    ])
+
+
+def fill_comment_counts(response, cached):
+    """Обновить числа комментариев в странице, взятой из кеша.
+
+    Свежая страница только запоминает свои числа: следующий показ
+    ее копии из кеша обойдется без запроса к базе.
+    """
+    totals = {
+        int(pk): int(total)
+        for total, pk in COMMENTS_RE.findall(response.content)
+    }
+    if not cached:
+        counts.remember_comments_counts(totals)
+    elif totals:
+        totals = counts.comments_counts(totals)
+        response.content = COMMENTS_RE.sub(
+            lambda match: b'%d<!--comments:%s-->' % (
+                totals.get(int(match[2]), 0), match[2]
+            ),
+            response.content,
+        )
+    return response
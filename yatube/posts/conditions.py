@@ -0,0 +1,94 @@
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.views.decorators.http import condition
+
+from .models import Post
+from .page_cache import (author_scope, get_last_modified, get_state,
+                         get_version, group_scope)
+
+
+VALIDATED_STATUSES = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_condition(get_scope):
+    """Отвечать 304 на повторный запрос ленты, пока ее версия не изменилась.
+
+    Last-Modified отдается только гостям: авторизованному пользователю
+    страница персональна, и его различает лишь ETag. Ответы с ошибкой,
+    например 404 несуществующей группы, уходят без валидаторов: версия
+    ленты считается без обращения к базе и о ее существовании не знает.
+    """
+    def etag(request, **kwargs):
+        scope = get_scope(**kwargs)
+        return make_etag(
+            scope, get_version(scope), get_state(scope), request.user.pk,
+            request.get_full_path(),
+        )
+
+    def last_modified(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return get_last_modified(get_scope(**kwargs))
+
+    conditional = condition(
+        etag_func=etag, last_modified_func=last_modified
+    )
+
+    def decorator(view):
+        view = conditional(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code not in VALIDATED_STATUSES:
+                del response['ETag']
+                del response['Last-Modified']
+            return response
+        return wrapper
+    return decorator
+
+
+def get_post_state(request, post_id):
+    """Время изменения поста и ленты, от которых зависит его страница."""
+    if not hasattr(request, 'post_state'):
+        state = Post.objects.filter(pk=post_id).values_list(
+            'updated', 'comments_count', 'author__username', 'group__slug'
+        ).first()
+        if state is not None:
+            updated, comments_count, username, slug = state
+            scopes = [author_scope(username)]
+            if slug is not None:
+                scopes.append(group_scope(slug))
+            state = updated, comments_count, scopes
+        request.post_state = state
+    return request.post_state
+
+
+def post_etag(request, post_id):
+    state = get_post_state(request, post_id)
+    if state is None:
+        return None
+    updated, comments_count, scopes = state
+    return make_etag(
+        updated.timestamp(), comments_count, *map(get_version, scopes),
+        request.user.pk, request.GET.get('page'),
+    )
+
+
+def post_last_modified(request, post_id):
+    state = get_post_state(request, post_id)
+    if state is None or request.user.is_authenticated:
+        return None
+    updated, _, scopes = state
+    return max(updated, *map(get_last_modified, scopes))
+
+
+post_condition = condition(
+    etag_func=post_etag, last_modified_func=post_last_modified
+)
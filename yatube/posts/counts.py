@@ -0,0 +1,160 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Follow, Group, Post, Profile, User
+
+ALL_POSTS_KEY = 'posts:count:all'
+# Счетчики, разошедшиеся из-за гонки прогрева с записью, живут не дольше.
+ALL_POSTS_TIMEOUT = 60 * 60
+COMMENTS_TIMEOUT = 60 * 60
+
+
+def all_posts_count():
+    count = cache.get(ALL_POSTS_KEY)
+    if count is None:
+        count = Post.objects.count()
+        cache.add(ALL_POSTS_KEY, count, ALL_POSTS_TIMEOUT)
+    return count
+
+
+def shift_all_posts_count(delta):
+    try:
+        cache.incr(ALL_POSTS_KEY, delta)
+    except ValueError:
+        pass
+
+
+def change_all_posts_count(delta):
+    """Сдвинуть прогретый счетчик после коммита: откат транзакции его
+    не трогает. Холодный счетчик пересчитается при чтении."""
+    transaction.on_commit(lambda: shift_all_posts_count(delta))
+
+
+def shifted(field, delta):
+    """Счетчик плюс delta, но не меньше нуля: разошедшийся после
+    bulk_create или прерванного импорта счетчик не ломает удаление."""
+    return Greatest(F(field) + delta, 0)
+
+
+def author_posts_count(author):
+    try:
+        return author.profile.posts_count
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(
+            user=author, defaults={'posts_count': author.posts.count()}
+        )
+        return profile.posts_count
+
+
+def change_group_count(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=shifted('posts_count', delta)
+        )
+
+
+def change_author_count(author_id, delta):
+    updated = Profile.objects.filter(user_id=author_id).update(
+        posts_count=shifted('posts_count', delta)
+    )
+    if not updated and delta > 0:
+        Profile.objects.get_or_create(
+            user_id=author_id,
+            defaults={
+                'posts_count': Post.objects.filter(author_id=author_id).count()
+            },
+        )
+
+
+def change_followers_count(author_id, delta):
+    updated = Profile.objects.filter(user_id=author_id).update(
+        followers_count=shifted('followers_count', delta)
+    )
+    if not updated and delta > 0:
+        Profile.objects.get_or_create(
+            user_id=author_id,
+            defaults={
+                'followers_count': Follow.objects.filter(
+                    author_id=author_id
+                ).count()
+            },
+        )
+
+
+def comments_key(post_id):
+    return f'posts:count:comments:{post_id}'
+
+
+def comments_counts(post_ids):
+    """Число комментариев постов: из кеша, недостающие одним запросом."""
+    keys = {comments_key(post_id): post_id for post_id in post_ids}
+    found = {
+        keys[key]: total for key, total in cache.get_many(keys).items()
+    }
+    missing = set(post_ids) - found.keys()
+    if missing:
+        fresh = dict(
+            Post.objects.filter(pk__in=missing).order_by()
+            .values_list('pk', 'comments_count')
+        )
+        remember_comments_counts(fresh)
+        found.update(fresh)
+    return found
+
+
+def remember_comments_counts(totals):
+    cache.set_many(
+        {comments_key(pk): total for pk, total in totals.items()},
+        COMMENTS_TIMEOUT,
+    )
+
+
+def change_comments_count(post_id, delta):
+    """Сдвинуть счетчик и забыть закешированное значение, еще раз после
+    коммита: иначе в кеш успеет лечь число до коммита."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+    key = comments_key(post_id)
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def recount(counters, post_field, counter_field):
+    """Исправить разошедшиеся счетчики и вернуть их число."""
+    actual = Coalesce(Subquery(
+        Post.objects.order_by()
+        .filter(**{post_field: OuterRef(counter_field)})
+        .values(post_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+    drifted = counters.annotate(actual=actual).exclude(
+        posts_count=F('actual')
+    )
+    return counters.filter(pk__in=drifted.values('pk')).update(
+        posts_count=actual
+    )
+
+
+def repair_counters(batch_size=1000):
+    """Пересчитать счетчики групп и авторов целиком.
+
+    Возвращает число исправленных групп и профилей.
+    """
+    Profile.objects.bulk_create(
+        (
+            Profile(user_id=user_id) for user_id in
+            User.objects.filter(profile=None).values_list('pk', flat=True)
+        ),
+        batch_size=batch_size,
+    )
+    cache.delete(ALL_POSTS_KEY)
+    return (
+        recount(Group.objects.all(), 'group', 'pk'),
+        recount(Profile.objects.all(), 'author', 'user_id'),
+    )
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+
+EXPORT_COLUMNS = ('id', 'text', 'pub_date', 'author', 'group')
+EXPORT_FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group__slug')
+FORMATS = ('jsonl', 'csv')
+
+
+def parse_since(value):
+    """Момент из строки ISO 8601; наивное время считается временем UTC."""
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        since = datetime.combine(day, time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    return since
+
+
+def export_rows(since=None, after_id=None, chunk_size=2000):
+    """Посты в порядке (pub_date, id) без загрузки всей таблицы в память."""
+    posts = Post.objects.order_by('pub_date', 'id')
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    if after_id is not None:
+        posts = posts.filter(id__gt=after_id)
+    return posts.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def jsonl_lines(rows):
+    for post_id, text, pub_date, author, group in rows:
+        yield json.dumps({
+            'id': post_id,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'author': author,
+            'group': group,
+        }, ensure_ascii=False) + '\n'
+
+
+def pop_value(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield pop_value(buffer)
+    for post_id, text, pub_date, author, group in rows:
+        writer.writerow((post_id, text, pub_date.isoformat(), author, group))
+        yield pop_value(buffer)
+
+
+def export_lines(data_format, rows):
+    return csv_lines(rows) if data_format == 'csv' else jsonl_lines(rows)
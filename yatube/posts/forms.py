@@ -1,14 +1,29 @@
 # posts/forms.py
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post
+from .images import normalize_image
+from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
-        fields = ['text', 'group', ]
+        fields = ['text', 'group', 'image', ]
         help_texts = {
             'text': 'Текст нового поста',
             'group': 'Группа, к которой будет относиться пост',
+            'image': 'Картинка будет уменьшена и пережата',
         }
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
+
+class CommentForm(forms.ModelForm):
+    class Meta:
+        model = Comment
+        fields = ['text', ]
@@ -0,0 +1,78 @@
+import io
+import os
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete
+
+from .models import Post
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+SAVE_OPTIONS = {
+    'WEBP': {'method': 4},
+    'JPEG': {'optimize': True, 'progressive': True},
+}
+
+
+def target_mode(image, image_format):
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    return 'RGBA' if has_alpha and image_format == 'WEBP' else 'RGB'
+
+
+def normalize_image(upload):
+    """Декодировать загрузку один раз, уменьшить и пережать без метаданных."""
+    image_format = settings.POST_IMAGE_FORMAT
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert(target_mode(image, image_format))
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        **SAVE_OPTIONS[image_format],
+    )
+    return ContentFile(
+        buffer.getvalue(), name=f'image.{EXTENSIONS[image_format]}'
+    )
+
+
+def release_image(name):
+    """Удалить файл и его миниатюры, если на него не ссылается ни один пост.
+
+    Файл сначала отводится в сторону и только потом проверяются ссылки:
+    загрузка того же содержимого в это время положит файл заново
+    (см. ContentAddressedStorage._save), а пост, успевший сослаться
+    на файл до проверки, вернет его на место.
+    """
+    if not name:
+        return False
+    field = Post._meta.get_field('image')
+    path = field.storage.path(name)
+    released = f'{path}.{uuid4().hex}.released'
+    try:
+        os.replace(path, released)
+    except FileNotFoundError:
+        released = None
+    if Post.objects.filter(image=name).exists():
+        if released:
+            os.replace(released, path)
+        return False
+    if released:
+        os.remove(released)
+    delete(field.attr_class(None, field, name), delete_file=False)
+    return True
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import backfill_due
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает посты бывших знаменитостей по лентам подписчиков, '
+        'если подписчиков меньше порога дольше TIMELINE_BACKFILL_DELAY. '
+        'Запускайте по расписанию, например раз в несколько минут.'
+    )
+
+    def handle(self, *args, **options):
+        done = backfill_due()
+        self.stdout.write(self.style.SUCCESS(
+            f'Дозаполнены ленты подписчиков авторов: {done}'
+        ))
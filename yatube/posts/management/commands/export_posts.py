@@ -0,0 +1,58 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export_lines, export_rows, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSONL или CSV, не загружая таблицу в память.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; ".gz" включает сжатие, "-" это stdout.',
+        )
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--since', type=parse_since,
+            help='Выгрузить посты, опубликованные начиная с этой даты.',
+        )
+        parser.add_argument(
+            '--after-id', type=int,
+            help='Выгрузить посты с id больше указанного.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.exported = self.last_id = 0
+        rows = self.track(export_rows(
+            options['since'], options['after_id'], options['chunk_size']
+        ))
+        lines = export_lines(options['format'], rows)
+        path = options['output']
+        if path == '-':
+            self.stdout.ending = ''
+            self.write(self.stdout, lines)
+            return
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            output = opener(path, 'wt', encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        with output:
+            self.write(output, lines)
+
+    def track(self, rows):
+        for row in rows:
+            self.exported += 1
+            self.last_id = max(self.last_id, row[0])
+            yield row
+
+    def write(self, output, lines):
+        for line in lines:
+            output.write(line)
+        self.stderr.write(
+            f'Выгружено постов: {self.exported}; '
+            f'для следующей выгрузки: --after-id {self.last_id}'
+        )
@@ -0,0 +1,232 @@
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import activity, counts, page_cache, timeline
+from posts.models import Group, Post, Profile, User
+
+FORMATS = ('jsonl', 'csv')
+FIELDS = ('text', 'author', 'group', 'pub_date')
+
+
+class LookupCache:
+    """Словарь natural key -> id, который дозапрашивает ключи пачками."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = set(keys) - self.ids.keys() - {None, ''}
+        for chunk in chunked(missing, 500):
+            self.ids.update(
+                self.model.objects.filter(**{f'{self.field}__in': chunk})
+                .values_list(self.field, 'pk')
+            )
+        self.ids.update(dict.fromkeys(missing - self.ids.keys()))
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def keep_pub_date():
+    """Не подменять pub_date текущим временем при bulk_create.
+
+    Флаг меняется у поля модели, общего для всех потоков, поэтому
+    это годится только для отдельного процесса команды.
+    """
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def insert_posts(posts):
+    """bulk_create с исходными pub_date, учет в статистике публикаций."""
+    with keep_pub_date():
+        Post.objects.bulk_create(posts)
+    activity.record_posts(posts)
+
+
+def parse_pub_date(value):
+    """Дата публикации из строки ISO 8601; False для нечитаемой даты."""
+    if not value:
+        return timezone.now()
+    try:
+        pub_date = parse_datetime(value)
+    except ValueError:
+        return False
+    if pub_date is None:
+        return False
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.utc)
+    return pub_date
+
+
+def clean_row(row):
+    """Строка как словарь строковых полей; ValueError, если это не так."""
+    if not isinstance(row, dict):
+        raise ValueError('ожидается объект')
+    for field in FIELDS:
+        if not isinstance(row.get(field), (str, type(None))):
+            raise ValueError(f'поле {field} должно быть строкой')
+    return row
+
+
+def read_rows(stream, data_format):
+    """Пары (номер строки, строка или ошибка разбора)."""
+    if data_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, clean_row(json.loads(line))
+        except ValueError as error:
+            yield number, error
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из JSONL или CSV пачками через bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами или "-" для чтения из stdin.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат входных данных; по умолчанию по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов записывать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        data_format = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'jsonl'
+        )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['path'] == '-':
+            return self.import_rows(sys.stdin, data_format, options)
+        try:
+            stream = open(options['path'], encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            return self.import_rows(stream, data_format, options)
+
+    def import_rows(self, stream, data_format, options):
+        self.authors = LookupCache(User, 'username')
+        self.groups = LookupCache(Group, 'slug')
+        self.author_ids, self.group_ids = set(), set()
+        imported = skipped = 0
+        started = time.monotonic()
+        rows = read_rows(stream, data_format)
+        try:
+            for batch in chunked(rows, options['batch_size']):
+                posts = self.build_posts(batch)
+                with transaction.atomic():
+                    insert_posts(posts)
+                imported += len(posts)
+                skipped += len(batch) - len(posts)
+                rate = imported / (time.monotonic() - started or 1)
+                self.stdout.write(
+                    f'Импортировано: {imported}, пропущено: {skipped}, '
+                    f'{rate:.0f} строк/с'
+                )
+        finally:
+            # Прошлые пачки уже в базе, даже если импорт оборвался.
+            self.refresh_counters(imported)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {imported} постов, пропущено {skipped}.'
+        ))
+
+    def report(self, number, message):
+        self.stderr.write(f'Строка {number}: {message}')
+
+    def build_posts(self, batch):
+        rows = []
+        for number, row in batch:
+            if isinstance(row, ValueError):
+                self.report(number, f'пропущена, {row}')
+            else:
+                rows.append((number, row))
+        self.authors.load(row.get('author') for _, row in rows)
+        self.groups.load(row.get('group') for _, row in rows)
+        posts = []
+        for number, row in rows:
+            author_id = self.authors.get(row.get('author'))
+            pub_date = parse_pub_date(row.get('pub_date'))
+            if author_id is None or not row.get('text') or not pub_date:
+                self.report(
+                    number, 'пропущена, нужны текст, известный автор '
+                    'и дата ISO 8601'
+                )
+                continue
+            group_id = self.groups.get(row.get('group'))
+            if group_id is None and row.get('group'):
+                self.report(
+                    number, f'группы {row["group"]!r} нет, пост '
+                    'импортирован без группы'
+                )
+            posts.append(Post(
+                text=row['text'],
+                author_id=author_id,
+                group_id=group_id,
+                pub_date=pub_date,
+            ))
+            self.author_ids.add(author_id)
+            if group_id is not None:
+                self.group_ids.add(group_id)
+        return posts
+
+    def refresh_counters(self, imported):
+        """bulk_create не шлет сигналов: обновить счетчики, ленты подписок
+        и кеши вручную."""
+        counts.change_all_posts_count(imported)
+        for author_id in self.author_ids:
+            if not timeline.is_celebrity(author_id):
+                timeline.backfill_followers(author_id)
+        for chunk in chunked(self.group_ids, 500):
+            groups = Group.objects.filter(pk__in=chunk)
+            counts.recount(groups, 'group', 'pk')
+            page_cache.bump_feeds(groups, User.objects.none())
+        for chunk in chunked(self.author_ids, 500):
+            Profile.objects.bulk_create(
+                Profile(user_id=pk) for pk in
+                User.objects.filter(pk__in=chunk, profile=None)
+                .values_list('pk', flat=True)
+            )
+            counts.recount(
+                Profile.objects.filter(user_id__in=chunk),
+                'author', 'user_id',
+            )
+            page_cache.bump_feeds(
+                Group.objects.none(), User.objects.filter(pk__in=chunk)
+            )
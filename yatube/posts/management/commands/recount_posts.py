@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.counts import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов групп и авторов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько профилей создавать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        groups, profiles = repair_counters(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено групп: {groups}, профилей: {profiles}'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.activity import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Сворачивает статистику публикаций в часовые и дневные корзины '
+        'и пересчитывает популярные группы и авторов за окно. '
+        'Запускайте по расписанию, например раз в несколько минут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Собрать корзины окна заново по таблице постов.',
+        )
+
+    def handle(self, *args, **options):
+        stats = rollup(rebuild_window=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Часовых корзин: {stats["hours"]}, дневных: {stats["days"]}, '
+            f'удалено старых: {stats["expired"]}, '
+            f'исправлено сумм: {stats["totals"]}'
+        ))
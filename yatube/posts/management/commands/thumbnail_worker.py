@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def make_thumbnails(image):
+    """Нарезка в потоке пула; ошибка возвращается, а не выбрасывается."""
+    if image is None:
+        return None
+    try:
+        thumbnails.make_thumbnails(image)
+    except Exception as error:
+        return error
+    finally:
+        connections.close_all()
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Разбирает очередь нарезки миниатюр для картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько потоков режут картинки параллельно.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Сколько заданий забирать из очереди за раз.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти.',
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Показать состояние очереди и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.write_stats()
+            return
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers и --batch-size больше нуля.')
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while True:
+                tasks = thumbnails.claim_tasks(options['batch_size'])
+                if tasks:
+                    self.process(pool, tasks)
+                elif options['once']:
+                    return
+                else:
+                    time.sleep(options['poll_interval'])
+
+    def process(self, pool, tasks):
+        started = time.monotonic()
+        posts = Post.objects.in_bulk(task.post_id for task in tasks)
+        posts = [posts.get(task.post_id) for task in tasks]
+        images = [
+            post.image if post and post.image.name == task.image else None
+            for task, post in zip(tasks, posts)
+        ]
+        errors = list(pool.map(make_thumbnails, images))
+        failed = 0
+        for task, error in zip(tasks, errors):
+            if error is None:
+                thumbnails.complete_task(task)
+            else:
+                failed += 1
+                thumbnails.fail_task(task, error)
+        rate = len(tasks) / (time.monotonic() - started or 1)
+        stats = thumbnails.queue_stats()
+        self.stdout.write(
+            f'Обработано: {len(tasks)}, ошибок: {failed}, '
+            f'{rate:.1f} картинок/с; в очереди: {stats["depth"]}'
+        )
+
+    def write_stats(self):
+        stats = thumbnails.queue_stats()
+        self.stdout.write(
+            f'В очереди: {stats["depth"]}\n'
+            f'Старейшее задание ждет: {stats["oldest_age"]:.0f} с\n'
+            f'Сдались после {thumbnails.MAX_ATTEMPTS} попыток: '
+            f'{stats["failed"]}'
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post, Profile
+from posts.paginators import CursorPaginator
+from posts.views import POSTS_ON_PAGE
+
+
+def index_addresses(pages):
+    """Адреса первых страниц ленты в том виде, как их выдает пагинатор."""
+    paginator = CursorPaginator(Post.objects.for_feed(), POSTS_ON_PAGE)
+    address = reverse('posts:index')
+    cursor = None
+    for _ in range(pages):
+        yield f'{address}?cursor={cursor}' if cursor else address
+        cursor = paginator.get_cursor_page(cursor).next_cursor
+        if cursor is None:
+            return
+
+
+def group_addresses():
+    for slug in Group.objects.values_list('slug', flat=True).iterator():
+        yield reverse('posts:group_list', kwargs={'slug': slug})
+
+
+def profile_addresses(authors):
+    usernames = Profile.objects.order_by('-posts_count').values_list(
+        'user__username', flat=True
+    )[:authors]
+    for username in usernames:
+        yield reverse('posts:profile', kwargs={'username': username})
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кеш страниц и карточек: первые страницы ленты, '
+        'группы и профили самых активных авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Сколько первых страниц главной ленты отрисовать.',
+        )
+        parser.add_argument(
+            '--authors', type=int, default=50,
+            help='Для скольких авторов с наибольшим числом постов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['pages'] < 0 or options['authors'] < 0:
+            raise CommandError('--pages и --authors не меньше нуля.')
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache'):
+            self.stderr.write(self.style.WARNING(
+                'Кеш в памяти процесса: прогрев не увидят воркеры сайта. '
+                'Задайте YATUBE_CACHE_BACKEND=file или db.'
+            ))
+        client = Client()
+        sections = (
+            ('главная', index_addresses(options['pages'])),
+            ('группы', group_addresses()),
+            ('профили', profile_addresses(options['authors'])),
+        )
+        for title, addresses in sections:
+            self.warm(client, title, addresses)
+
+    def warm(self, client, title, addresses):
+        started = time.monotonic()
+        warmed = failed = 0
+        for address in addresses:
+            if client.get(address).status_code == 200:
+                warmed += 1
+            else:
+                failed += 1
+                self.stderr.write(f'Не удалось прогреть {address}')
+        self.stdout.write(
+            f'{title}: {warmed} страниц за '
+            f'{time.monotonic() - started:.1f} с, ошибок: {failed}'
+        )
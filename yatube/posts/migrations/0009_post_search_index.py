@@ -0,0 +1,75 @@
+from django.db import migrations, transaction
+
+# SQL зафиксирован здесь: миграция не должна меняться вместе с posts.search.
+SEARCH_TABLE = 'posts_post_fts'
+BACKFILL_BATCH = 5000
+
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS_SQL = (
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert '
+    'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update '
+    'AFTER UPDATE OF text ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        for sql in TRIGGERS_SQL:
+            cursor.execute(sql)
+        last_id = 0
+        while True:
+            cursor.execute(
+                'SELECT id FROM posts_post WHERE id > %s ORDER BY id LIMIT %s',
+                [last_id, BACKFILL_BATCH],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return
+            with transaction.atomic(using=connection.alias):
+                cursor.execute(
+                    f'INSERT INTO {SEARCH_TABLE}(rowid, text) '
+                    'SELECT id, text FROM posts_post WHERE id BETWEEN %s AND %s',
+                    [ids[0], ids[-1]],
+                )
+            last_id = ids[-1]
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for action in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{action}')
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('posts', '0008_group_posts_count_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_comments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('author', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Group', verbose_name='Группа')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ActivityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(choices=[('minute', 'Минута'), ('hour', 'Час'), ('day', 'День')], max_length=6, verbose_name='Интервал')),
+                ('start', models.DateTimeField(verbose_name='Начало интервала')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to='posts.Group', verbose_name='Группа')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='activitytotal',
+            index=models.Index(condition=models.Q(group__isnull=False), fields=['-posts', '-id'], name='activity_top_groups_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitytotal',
+            index=models.Index(condition=models.Q(author__isnull=False), fields=['-posts', '-id'], name='activity_top_authors_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitytotal',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('author__isnull', False), ('group__isnull', True)), models.Q(('author__isnull', True), ('group__isnull', False)), _connector='OR'), name='activity_total_group_or_author'),
+        ),
+        migrations.AddIndex(
+            model_name='activitybucket',
+            index=models.Index(fields=['size', 'start'], name='activity_bucket_size_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitybucket',
+            constraint=models.UniqueConstraint(fields=('group', 'size', 'start'), name='activity_bucket_group_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitybucket',
+            constraint=models.UniqueConstraint(fields=('author', 'size', 'start'), name='activity_bucket_author_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitybucket',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('author__isnull', False), ('group__isnull', True)), models.Q(('author__isnull', True), ('group__isnull', False)), _connector='OR'), name='activity_bucket_group_or_author'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='backfill_requested',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Ленты ждут дозаполнения с'),
+        ),
+    ]
@@ -1,9 +1,28 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
+FEED_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'thumbnails_ready',
+    'comments_count',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__slug',
+    'group__title',
+)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -20,11 +39,50 @@ class Group(models.Model):
         verbose_name="Описание",
         help_text="Введите описание группы",
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число постов",
+    )
 
     def __str__(self):
         return self.title
 
 
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name="Пользователь",
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число постов",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число подписчиков",
+    )
+    backfill_requested = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Ленты ждут дозаполнения с",
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name="Текст поста",
@@ -49,14 +107,328 @@ class Post(models.Model):
         verbose_name="Группа",
         help_text="Выберите группу",
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True,
+    )
+    thumbnails_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Миниатюры готовы",
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число комментариев",
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    loaded_values = {}
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        post.loaded_values = dict(zip(field_names, values))
+        return post
+
+    @property
+    def image_changed(self):
+        return bool(self.image) and (
+            self.image.name != self.loaded_values.get('image')
+        )
+
+    def save(self, *args, **kwargs):
+        if self.image_changed:
+            self.thumbnails_ready = False
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self.loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+        if 'image' in self.loaded_values:
+            # FieldFile меняется на месте при image.save(), храним имя.
+            self.loaded_values['image'] = self.image.name
+
+
+class Comment(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name="Автор комментария",
+    )
+    text = models.TextField(
+        verbose_name="Текст комментария",
+        help_text="Введите текст комментария",
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата комментария",
+    )
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ThumbnailTask(models.Model):
+    """Задание очереди на нарезку миниатюр для картинки поста."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_tasks',
+        verbose_name="Пост",
+    )
+    image = models.CharField(max_length=100, verbose_name="Картинка")
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата постановки",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попытки",
+    )
+    last_error = models.TextField(blank=True, verbose_name="Ошибка")
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.image
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name="Подписчик",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name="Автор",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='follow_unique'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, разложенный при публикации.
+
+    Дата поста продублирована, чтобы страница ленты читалась одним
+    проходом по индексу (user, -pub_date, -post).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name="Читатель",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Автор поста",
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class ActivityBucket(models.Model):
+    """Сколько постов опубликовано в группе или автором за интервал.
+
+    При публикации растет минутная корзина, manage.py rollup_stats
+    сворачивает минуты в часы, а часы в дни.
+    """
+
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    SIZES = (
+        (MINUTE, 'Минута'),
+        (HOUR, 'Час'),
+        (DAY, 'День'),
+    )
+
+    group = models.ForeignKey(
+        Group,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='activity_buckets',
+        verbose_name="Группа",
+    )
+    author = models.ForeignKey(
+        User,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='activity_buckets',
+        verbose_name="Автор",
+    )
+    size = models.CharField(
+        max_length=6, choices=SIZES, verbose_name="Интервал"
+    )
+    start = models.DateTimeField(verbose_name="Начало интервала")
+    posts = models.PositiveIntegerField(
+        default=0, verbose_name="Число постов"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'size', 'start'],
+                name='activity_bucket_group_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['author', 'size', 'start'],
+                name='activity_bucket_author_unique',
+            ),
+            models.CheckConstraint(
+                check=(
+                    models.Q(group__isnull=True, author__isnull=False)
+                    | models.Q(group__isnull=False, author__isnull=True)
+                ),
+                name='activity_bucket_group_or_author',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['size', 'start'], name='activity_bucket_size_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.group or self.author} {self.size} {self.start}'
+
+
+class ActivityTotal(models.Model):
+    """Постов группы или автора за окно ACTIVITY_WINDOW_DAYS дней.
+
+    Частичные индексы по -posts отдают первые k групп или авторов,
+    не просматривая остальные строки.
+    """
+
+    group = models.OneToOneField(
+        Group,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name="Группа",
+    )
+    author = models.OneToOneField(
+        User,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name="Автор",
+    )
+    posts = models.PositiveIntegerField(
+        default=0, verbose_name="Число постов"
+    )
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(group__isnull=True, author__isnull=False)
+                    | models.Q(group__isnull=False, author__isnull=True)
+                ),
+                name='activity_total_group_or_author',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['-posts', '-id'],
+                name='activity_top_groups_idx',
+                condition=models.Q(group__isnull=False),
+            ),
+            models.Index(
+                fields=['-posts', '-id'],
+                name='activity_top_authors_idx',
+                condition=models.Q(author__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.group or self.author}: {self.posts}'
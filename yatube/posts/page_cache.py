@@ -0,0 +1,167 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import urlencode
+
+PAGE_TIMEOUT = 60 * 60 * 24
+# Параметры, от которых зависит страница ленты; остальные в ключ кеша
+# не попадают, чтобы мусорные параметры не плодили записи.
+PAGE_PARAMS = ('page', 'cursor')
+
+
+def all_posts_scope():
+    return 'all'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def version_key(scope):
+    return f'posts:page-version:{scope}'
+
+
+def last_modified_key(scope):
+    return f'posts:last-modified:{scope}'
+
+
+def state_key(scope):
+    return f'posts:page-state:{scope}'
+
+
+def get_version(scope):
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Версия с отметкой времени не совпадет с версией вытесненного ключа.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_state(scope):
+    """Версия данных ленты, не входящих в закешированную страницу."""
+    key = state_key(scope)
+    state = cache.get(key)
+    if state is None:
+        cache.add(key, int(time.time() * 1000), None)
+        state = cache.get(key)
+    return state
+
+
+def get_last_modified(scope):
+    key = last_modified_key(scope)
+    last_modified = cache.get(key)
+    if last_modified is None:
+        cache.add(key, timezone.now(), None)
+        last_modified = cache.get(key)
+    return last_modified
+
+
+def bump_versions(scopes):
+    """Сделать недоступными закешированные страницы этих лент.
+
+    Внутри транзакции версии сдвигаются еще раз после коммита: гость мог
+    успеть отрисовать старые строки и положить их под новой версией.
+    """
+    scopes = list(scopes)
+    shift_versions(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: shift_versions(scopes))
+
+
+def shift_versions(scopes):
+    now = timezone.now()
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            pass
+        cache.set(last_modified_key(scope), now, None)
+
+
+def touch_versions(scopes):
+    """Сменить валидаторы лент, не сбрасывая их страниц из кеша.
+
+    Нужно для данных, которые подставляются в страницу при каждом ответе:
+    закешированная страница остается верной, а 304 по старому ETag - нет.
+    """
+    scopes = list(scopes)
+    shift_states(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: shift_states(scopes))
+
+
+def shift_states(scopes):
+    now = timezone.now()
+    for scope in scopes:
+        try:
+            cache.incr(state_key(scope))
+        except ValueError:
+            pass
+        cache.set(last_modified_key(scope), now, None)
+
+
+def bump_feeds(groups, authors, extra_scopes=()):
+    """Сбросить страницы общей ленты и лент этих групп и авторов."""
+    scopes = [all_posts_scope(), *extra_scopes]
+    scopes.extend(
+        group_scope(slug)
+        for slug in groups.order_by().values_list('slug', flat=True)
+    )
+    scopes.extend(
+        author_scope(username)
+        for username in authors.order_by().values_list('username', flat=True)
+    )
+    bump_versions(scopes)
+
+
+def page_key(request, scope):
+    params = urlencode([
+        (name, request.GET[name]) for name in PAGE_PARAMS
+        if name in request.GET
+    ])
+    path = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return f'posts:page:{scope}:{get_version(scope)}:{path}'
+
+
+def cache_anonymous_page(get_scope, refresh=None):
+    """Кешировать страницу ленты для гостей до изменения ее постов.
+
+    get_scope получает именованные аргументы view и возвращает ленту,
+    чья версия входит в ключ кеша. Отметка anonymous_page_cache
+    на view отправляет такие запросы гостей на основную базу: страница,
+    прочитанная с отстающей реплики, легла бы в кеш под новой версией.
+
+    refresh(response, cached) получает каждый ответ гостю и обновляет
+    в странице данные, которые меняются без смены версии ленты.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = page_key(request, get_scope(**kwargs))
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response, PAGE_TIMEOUT)
+                cached = False
+            else:
+                cached = True
+            if refresh is not None:
+                response = refresh(response, cached)
+            return response
+        wrapper.anonymous_page_cache = True
+        return wrapper
+    return decorator
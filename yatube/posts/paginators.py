@@ -0,0 +1,118 @@
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'n'
+PREVIOUS = 'p'
+PAGES_ON_EACH_SIDE = 2
+
+
+def encode_cursor(direction, post):
+    position = f'{direction}{post.pub_date.isoformat()}|{post.pk}'
+    return urlsafe_base64_encode(position.encode())
+
+
+def decode_cursor(cursor):
+    """Вернуть (направление, pub_date, id) или None для битого курсора."""
+    try:
+        position = force_str(urlsafe_base64_decode(cursor))
+        pub_date, pk = position[1:].split('|')
+        pub_date, pk = parse_datetime(pub_date), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if position[0] not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return position[0], pub_date, pk
+
+
+class WindowedPage(Page):
+    @cached_property
+    def page_window(self):
+        """Номера страниц вокруг текущей; None обозначает пропуск."""
+        last = self.paginator.num_pages
+        start = max(self.number - PAGES_ON_EACH_SIDE, 1)
+        end = min(self.number + PAGES_ON_EACH_SIDE, last)
+        window = list(range(start, end + 1))
+        if start > 2:
+            window.insert(0, None)
+        if start > 1:
+            window.insert(0, 1)
+        if end < last - 1:
+            window.append(None)
+        if end < last:
+            window.append(last)
+        return window
+
+
+class CountedPaginator(Paginator):
+    """Paginator, который берет число постов из готового счетчика."""
+
+    def __init__(self, object_list, per_page, get_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.get_count = get_count
+
+    @cached_property
+    def count(self):
+        return self.get_count()
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class CursorPage(Page):
+    """Страница ленты, которая знает только соседей, но не свой номер."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET."""
+
+    def get_cursor_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        posts = self.object_list.order_by('-pub_date', '-id')
+        if position is None:
+            return self._page(posts, has_previous=False)
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            posts = posts.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+            return self._page(posts, has_previous=True)
+        posts = posts.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ).reverse()
+        rows = list(posts[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._cursor_page(rows, has_previous, has_next=True)
+
+    def _page(self, posts, has_previous):
+        rows = list(posts[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self._cursor_page(rows[:self.per_page], has_previous, has_next)
+
+    def _cursor_page(self, rows, has_previous, has_next):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(PREVIOUS, rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,105 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+MAX_TERMS = 8
+TOKEN_RE = re.compile(r'\w+')
+
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS_SQL = (
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert '
+    'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update '
+    'AFTER UPDATE OF text ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+)
+
+
+def create_triggers(cursor):
+    """Триггеры пропадают, когда SQLite пересоздает таблицу постов."""
+    for sql in TRIGGERS_SQL:
+        cursor.execute(sql)
+
+
+def match_expression(query):
+    """Поисковая строка -> выражение MATCH: все слова, последнее префиксом."""
+    terms = [
+        f'"{token}"' for token in TOKEN_RE.findall(query.lower())[:MAX_TERMS]
+    ]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_cursor(rank, pk):
+    return urlsafe_base64_encode(f'{rank!r}|{pk}'.encode())
+
+
+def decode_cursor(cursor):
+    """Вернуть (rank, id) или None для битого курсора."""
+    try:
+        rank, pk = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return float(rank), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def search_post_ids(query, cursor=None, limit=10):
+    """Id постов по убыванию релевантности и курсор следующей страницы."""
+    match = match_expression(query)
+    if not match:
+        return [], None
+    sql = (
+        f'SELECT rowid, rank FROM {SEARCH_TABLE} '
+        f'WHERE {SEARCH_TABLE} MATCH %s'
+    )
+    params = [match]
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        rank, pk = position
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [rank, rank, pk]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        pk, rank = rows[limit - 1]
+        next_cursor = encode_cursor(rank, pk)
+    return [pk for pk, _ in rows[:limit]], next_cursor
+
+
+def search_posts(query, cursor=None, limit=10):
+    post_ids, next_cursor = search_post_ids(query, cursor, limit)
+    posts = Post.objects.for_feed().in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts], next_cursor
+
+
+def matching_ids(query):
+    """Подзапрос с id всех найденных постов, например для админки."""
+    return RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
@@ -0,0 +1,301 @@
+import threading
+
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import (activity, cards, counts, images, page_cache, search,
+               thumbnails, timeline)
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+# Посты, удаляемые в этом потоке прямо сейчас: каскад их комментариев
+# не трогает счетчики и ленты, это сделает удаление самого поста.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+def forget_post_cards(posts):
+    cards.forget_cards(
+        posts.order_by().values_list('pk', 'updated')
+    )
+
+
+def is_login_update(update_fields):
+    return update_fields == frozenset({'last_login'})
+
+
+@receiver(post_save, sender=Post)
+def update_post_counts(sender, instance, created, **kwargs):
+    if created:
+        counts.change_all_posts_count(1)
+        counts.change_group_count(instance.group_id, 1)
+        counts.change_author_count(instance.author_id, 1)
+        return
+    loaded = instance.loaded_values
+    old_group_id = loaded.get('group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counts.change_group_count(old_group_id, -1)
+        counts.change_group_count(instance.group_id, 1)
+    old_author_id = loaded.get('author_id', instance.author_id)
+    if old_author_id != instance.author_id:
+        counts.change_author_count(old_author_id, -1)
+        counts.change_author_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrease_post_counts(sender, instance, **kwargs):
+    counts.change_all_posts_count(-1)
+    counts.change_group_count(instance.group_id, -1)
+    counts.change_author_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def forget_previous_card(sender, instance, created, **kwargs):
+    updated = instance.loaded_values.get('updated')
+    if updated is not None and updated != instance.updated:
+        cards.forget_cards([(instance.pk, updated)])
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_card(sender, instance, **kwargs):
+    cards.forget_cards([(instance.pk, instance.updated)])
+
+
+@receiver(post_save, sender=Group)
+def forget_group_cards(sender, instance, created, **kwargs):
+    if not created:
+        forget_post_cards(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def forget_deleted_group_cards(sender, instance, **kwargs):
+    forget_post_cards(instance.posts.all())
+
+
+@receiver(post_save, sender=User)
+def forget_author_cards(sender, instance, created, update_fields, **kwargs):
+    if created or is_login_update(update_fields):
+        return
+    forget_post_cards(instance.posts.all())
+
+
+@receiver(post_save, sender=Post)
+def bump_saved_post_feeds(sender, instance, **kwargs):
+    loaded = instance.loaded_values
+    group_ids = {instance.group_id, loaded.get('group_id')}
+    author_ids = {instance.author_id, loaded.get('author_id')}
+    page_cache.bump_feeds(
+        Group.objects.filter(pk__in=group_ids - {None}),
+        User.objects.filter(pk__in=author_ids - {None}),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_feeds(sender, instance, **kwargs):
+    page_cache.bump_feeds(
+        Group.objects.filter(pk=instance.group_id),
+        User.objects.filter(pk=instance.author_id),
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance.saved_slug = None
+    if instance.pk is not None:
+        instance.saved_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def bump_saved_group_feeds(sender, instance, created, **kwargs):
+    if created:
+        # По этому адресу могла раньше быть страница 404 или другая группа.
+        page_cache.bump_versions([page_cache.group_scope(instance.slug)])
+        return
+    extra_scopes = []
+    if instance.saved_slug is not None:
+        extra_scopes.append(page_cache.group_scope(instance.saved_slug))
+    page_cache.bump_feeds(
+        Group.objects.filter(pk=instance.pk),
+        User.objects.filter(posts__group=instance).distinct(),
+        extra_scopes,
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def bump_deleted_group_feeds(sender, instance, **kwargs):
+    page_cache.bump_feeds(
+        Group.objects.filter(pk=instance.pk),
+        User.objects.filter(posts__group=instance).distinct(),
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields, **kwargs):
+    instance.saved_username = None
+    if instance.pk is not None and not is_login_update(update_fields):
+        instance.saved_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def bump_saved_author_feeds(sender, instance, created, update_fields,
+                            **kwargs):
+    if created or is_login_update(update_fields):
+        return
+    extra_scopes = []
+    if instance.saved_username is not None:
+        extra_scopes.append(page_cache.author_scope(instance.saved_username))
+    page_cache.bump_feeds(
+        Group.objects.filter(posts__author=instance).distinct(),
+        User.objects.filter(pk=instance.pk),
+        extra_scopes,
+    )
+
+
+@receiver(pre_delete, sender=User)
+def bump_deleted_author_feeds(sender, instance, **kwargs):
+    page_cache.bump_feeds(
+        Group.objects.filter(posts__author=instance).distinct(),
+        User.objects.filter(pk=instance.pk),
+    )
+
+
+@receiver(post_save, sender=Post)
+def enqueue_thumbnails(sender, instance, **kwargs):
+    if instance.image_changed:
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    old_image = instance.loaded_values.get('image')
+    if old_image and old_image != instance.image.name:
+        transaction.on_commit(lambda: images.release_image(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.release_image(name))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    old_author_id = instance.loaded_values.get('author_id')
+    if created:
+        timeline.fan_out(instance)
+    elif old_author_id not in (None, instance.author_id):
+        TimelineEntry.objects.filter(post=instance).delete()
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_posts(sender, instance, created, **kwargs):
+    if not created:
+        return
+    counts.change_followers_count(instance.author_id, 1)
+    if not timeline.is_celebrity(instance.author_id):
+        timeline.backfill([instance.user_id], instance.author_id)
+    # Кнопка подписки на странице автора сменилась.
+    page_cache.bump_versions(
+        [page_cache.author_scope(instance.author.username)]
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def remove_followed_posts(sender, instance, **kwargs):
+    counts.change_followers_count(instance.author_id, -1)
+    timeline.forget(instance.user_id, instance.author_id)
+    if timeline.left_celebrities(instance.author_id):
+        timeline.request_backfill(instance.author_id)
+    page_cache.bump_versions(
+        [page_cache.author_scope(instance.author.username)]
+    )
+
+
+@receiver(post_save, sender=Post)
+def record_post_activity(sender, instance, created, **kwargs):
+    if created:
+        activity.record_post(instance)
+    else:
+        activity.move_post(instance, instance.loaded_values)
+
+
+@receiver(post_delete, sender=Post)
+def discard_post_activity(sender, instance, **kwargs):
+    activity.discard_post(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def forget_activity_sidebar(sender, **kwargs):
+    """В списках на главной названия групп и имена авторов."""
+    activity.forget_sidebar()
+
+
+@receiver(post_save, sender=User)
+def forget_author_activity_sidebar(sender, created, update_fields, **kwargs):
+    if not created and not is_login_update(update_fields):
+        activity.forget_sidebar()
+
+
+@receiver(post_save, sender=Comment)
+def count_added_comment(sender, instance, created, **kwargs):
+    if created:
+        counts.change_comments_count(instance.post_id, 1)
+        touch_commented_post_feeds(instance.post_id)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleting_post(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleting_post(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    counts.change_comments_count(instance.post_id, -1)
+    touch_commented_post_feeds(instance.post_id)
+
+
+def touch_commented_post_feeds(post_id):
+    """Сменить валидаторы лент с карточкой поста, не сбрасывая страницы:
+    число комментариев подставляется в них при каждом ответе."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return
+    username, slug = post
+    scopes = [page_cache.all_posts_scope(), page_cache.author_scope(username)]
+    if slug is not None:
+        scopes.append(page_cache.group_scope(slug))
+    page_cache.touch_versions(scopes)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """SQLite теряет триггеры поиска, когда миграция пересоздает posts_post."""
+    if sender.name != 'posts':
+        return
+    connection = connections[using]
+    if search.SEARCH_TABLE in connection.introspection.table_names():
+        with connection.cursor() as cursor:
+            search.create_triggers(cursor)
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# mkstemp создает файл с правами 0600; без FILE_UPLOAD_PERMISSIONS файл
+# должен получить те же права, что у FileSystemStorage: 0666 без umask.
+# umask читается при импорте, пока потоков запросов еще нет.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - sha256 содержимого.
+
+    Файл ложится в каталог вида posts/ab/cd/abcd....webp, поэтому
+    одинаковое содержимое хранится один раз, а каталоги не разрастаются.
+    Содержимое пишется во временный файл кусками и хешируется по пути.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.upload-', dir=self.location)
+        hasher = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+            digest = hasher.hexdigest()
+            name = posixpath.join(
+                directory, digest[:2], digest[2:4], digest + extension
+            )
+            full_path = self.path(name)
+            # Файл кладется и тогда, когда имя уже есть: его могли только
+            # что удалить вместе с последним постом, см. release_image.
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        else:
+            os.chmod(full_path, 0o666 & ~UMASK)
+        return name
@@ -0,0 +1,19 @@
+from django import template
+
+from posts.cards import render_card
+from posts.thumbnails import make_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, show_author=True):
+    return render_card(post, show_author)
+
+
+@register.simple_tag
+def post_thumbnail(post, name):
+    """Готовая миниатюра или None, пока воркер ее не нарезал."""
+    if not post.image or not post.thumbnails_ready:
+        return None
+    return make_thumbnail(post.image, name)
@@ -0,0 +1,234 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import activity
+from posts.models import ActivityBucket, ActivityTotal, Group, Post, User
+
+NOW = datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc)
+
+
+def totals(field):
+    return dict(
+        ActivityTotal.objects.filter(**{f'{field}__isnull': False})
+        .values_list(field, 'posts')
+    )
+
+
+class ActivityTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тихая группа', slug='quiet', description='Описание'
+        )
+        cls.busy_group = Group.objects.create(
+            title='Шумная группа', slug='busy', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Страницы гостя кешируются целиком, а нужен сам контекст.
+        self.client = Client()
+        self.client.force_login(self.other)
+
+    def sidebar(self):
+        response = self.client.get(reverse('posts:index'))
+        return response.context['trending_groups'], (
+            response.context['top_authors']
+        )
+
+    def test_new_posts_are_counted(self):
+        """Новый пост попадает в минутную корзину и суммы группы и автора."""
+        for group in (self.group, self.busy_group, self.busy_group, None):
+            Post.objects.create(text='Пост', author=self.author, group=group)
+        self.assertEqual(
+            totals('group'), {self.group.pk: 1, self.busy_group.pk: 2}
+        )
+        self.assertEqual(totals('author'), {self.author.pk: 4})
+        self.assertEqual(
+            set(ActivityBucket.objects.values_list('size', flat=True)),
+            {ActivityBucket.MINUTE},
+        )
+
+    def test_index_shows_ranked_lists(self):
+        """Главная показывает группы и авторов по числу постов за окно."""
+        Post.objects.create(text='Пост', author=self.other, group=self.group)
+        for _ in range(3):
+            Post.objects.create(
+                text='Пост', author=self.author, group=self.busy_group
+            )
+        groups, authors = self.sidebar()
+        self.assertEqual(
+            [(group['slug'], group['posts']) for group in groups],
+            [('busy', 3), ('quiet', 1)],
+        )
+        self.assertEqual(
+            [(author['username'], author['posts']) for author in authors],
+            [('author', 3), ('other', 1)],
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, f'href="{reverse("posts:group_list", args=["busy"])}"'
+        )
+        self.assertContains(response, 'Лев Толстой')
+
+    @override_settings(ACTIVITY_SIDEBAR_SIZE=1)
+    def test_sidebar_is_cached_until_new_post(self):
+        """Списки читаются из кеша, пока не опубликован новый пост."""
+        Post.objects.create(text='Пост', author=self.other, group=self.group)
+        self.sidebar()
+        with CaptureQueriesContext(connection) as queries:
+            self.sidebar()
+        self.assertFalse([
+            query for query in queries
+            if 'posts_activitytotal' in query['sql']
+        ])
+        for _ in range(2):
+            Post.objects.create(
+                text='Пост', author=self.author, group=self.busy_group
+            )
+        groups, authors = self.sidebar()
+        self.assertEqual([group['slug'] for group in groups], ['busy'])
+        self.assertEqual([author['username'] for author in authors],
+                         ['author'])
+
+    def add_bucket(self, size, start, posts, owner=None):
+        ActivityBucket.objects.create(
+            group=owner or self.group, size=size, start=start, posts=posts
+        )
+
+    def test_rollup_compacts_and_expires(self):
+        """Минуты прошлых часов сворачиваются в часы, часы до вчерашнего
+        дня - в дни, корзины старше окна удаляются, суммы пересчитываются."""
+        today = NOW.replace(hour=0, minute=0)
+        buckets = (
+            (ActivityBucket.MINUTE, NOW.replace(minute=10), 1),
+            (ActivityBucket.MINUTE, NOW.replace(hour=11, minute=5), 2),
+            (ActivityBucket.MINUTE, NOW.replace(hour=11, minute=40), 3),
+            (ActivityBucket.HOUR, today - timedelta(hours=1), 4),
+            (ActivityBucket.HOUR, today - timedelta(days=2, hours=-3), 5),
+            (ActivityBucket.HOUR, today - timedelta(days=2, hours=-20), 6),
+            (ActivityBucket.DAY, today - timedelta(days=10), 7),
+        )
+        for size, start, posts in buckets:
+            self.add_bucket(size, start, posts)
+        ActivityTotal.objects.create(group=self.group, posts=100)
+        ActivityTotal.objects.create(group=self.busy_group, posts=5)
+        activity.rollup(NOW)
+        self.assertEqual(
+            sorted(ActivityBucket.objects.values_list(
+                'size', 'start', 'posts'
+            )),
+            sorted([
+                (ActivityBucket.MINUTE, NOW.replace(minute=10), 1),
+                (ActivityBucket.HOUR, NOW.replace(minute=0, hour=11), 5),
+                (ActivityBucket.HOUR, today - timedelta(hours=1), 4),
+                (ActivityBucket.DAY, today - timedelta(days=2), 11),
+            ]),
+        )
+        self.assertEqual(totals('group'), {self.group.pk: 21})
+
+    def test_rollup_adds_to_existing_buckets(self):
+        """Свертка прибавляет к уже свернутой корзине того же часа."""
+        hour = NOW.replace(hour=9, minute=0)
+        self.add_bucket(ActivityBucket.HOUR, hour, 4)
+        self.add_bucket(ActivityBucket.MINUTE, hour.replace(minute=15), 2)
+        activity.rollup(NOW)
+        self.assertEqual(
+            list(ActivityBucket.objects.values_list('size', 'posts')),
+            [(ActivityBucket.HOUR, 6)],
+        )
+
+    def test_command_rebuilds_window_from_posts(self):
+        """rollup_stats --rebuild восстанавливает статистику по постам."""
+        for group in (self.group, self.busy_group, self.busy_group):
+            Post.objects.create(text='Пост', author=self.author, group=group)
+        old = Post.objects.create(text='Старый', author=self.other)
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        ActivityBucket.objects.all().delete()
+        ActivityTotal.objects.all().delete()
+        out = StringIO()
+        call_command('rollup_stats', '--rebuild', stdout=out)
+        self.assertIn('исправлено сумм: 3', out.getvalue())
+        self.assertEqual(
+            totals('group'), {self.group.pk: 1, self.busy_group.pk: 2}
+        )
+        self.assertEqual(totals('author'), {self.author.pk: 3})
+
+    def test_deleted_and_moved_posts_are_uncounted(self):
+        """Удаление поста и перенос в другую группу или к другому автору
+        сразу меняют корзины и суммы, в том числе уже свернутые."""
+        posts = [
+            Post.objects.create(text='Пост', author=self.author, group=group)
+            for group in (self.group, self.group, self.busy_group)
+        ]
+        posts[0].delete()
+        moved = Post.objects.get(pk=posts[1].pk)
+        moved.group = self.busy_group
+        moved.author = self.other
+        moved.save()
+        self.assertEqual(
+            totals('group'), {self.group.pk: 0, self.busy_group.pk: 2}
+        )
+        self.assertEqual(
+            totals('author'), {self.author.pk: 1, self.other.pk: 1}
+        )
+        activity.rollup(timezone.now() + timedelta(hours=1))
+        self.assertEqual(totals('group'), {self.busy_group.pk: 2})
+        Post.objects.get(pk=posts[2].pk).delete()
+        self.assertEqual(
+            list(ActivityBucket.objects.filter(group=self.busy_group)
+                 .values_list('size', 'posts')),
+            [(ActivityBucket.HOUR, 1)],
+        )
+        activity.rollup(timezone.now() + timedelta(hours=1))
+        self.assertEqual(totals('group'), {self.busy_group.pk: 1})
+        self.assertEqual(totals('author'), {self.other.pk: 1})
+
+    def test_deleted_group_leaves_sidebar(self):
+        """Удаленная группа пропадает из списка сразу."""
+        Post.objects.create(text='Пост', author=self.author, group=self.group)
+        self.assertEqual(len(self.sidebar()[0]), 1)
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertEqual(self.sidebar()[0], [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class ActivityQueryPlanTest(TestCase):
+    def test_lists_read_first_rows_of_partial_indexes(self):
+        """Каждый список - проход по своему частичному индексу без
+        сортировки."""
+        for field, index in (
+            ('group', 'activity_top_groups_idx'),
+            ('author', 'activity_top_authors_idx'),
+        ):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                activity.sidebar()
+            sql = [
+                query['sql'] for query in queries
+                if f'"posts_activitytotal"."{field}_id" IS NOT NULL'
+                in query['sql']
+            ]
+            self.assertEqual(len(sql), 1)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql[0])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            with self.subTest(field=field):
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.cards import CARD_TEMPLATE, card_key
+from posts.models import Group, Post, User
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.other_user = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='first',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.other_user)
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+        self.other_post = Post.objects.create(
+            text='Чужой пост', author=self.other_user
+        )
+
+    def get_index(self):
+        return self.reader_client.get(reverse('posts:index'))
+
+    def is_cached(self, post):
+        post.refresh_from_db()
+        return card_key(post.pk, post.updated, 'author') in cache
+
+    def test_cards_are_rendered_once(self):
+        """Карточки постов берутся из кеша при повторном показе ленты."""
+        self.assertTemplateUsed(self.get_index(), CARD_TEMPLATE)
+        response = self.get_index()
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_edit_replaces_card(self):
+        """Отредактированный пост показывается с новым текстом."""
+        self.get_index()
+        self.author_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        response = self.get_index()
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Тестовый пост')
+        self.assertTrue(self.is_cached(self.other_post))
+
+    def test_group_change_forgets_only_group_cards(self):
+        """Изменение группы сбрасывает только карточки ее постов."""
+        self.get_index()
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertFalse(self.is_cached(self.post))
+        self.assertTrue(self.is_cached(self.other_post))
+        self.assertContains(self.get_index(), '/group/renamed/')
+
+    def test_group_delete_forgets_group_cards(self):
+        """Удаление группы убирает ссылку на нее из карточек."""
+        group = Group.objects.create(
+            title='Временная группа',
+            slug='temporary',
+            description='Тестовое описание',
+        )
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        self.get_index()
+        group.delete()
+        self.assertNotContains(self.get_index(), '/group/temporary/')
+
+    def test_author_change_forgets_only_author_cards(self):
+        """Изменение автора сбрасывает только карточки его постов."""
+        self.get_index()
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        self.assertFalse(self.is_cached(self.post))
+        self.assertTrue(self.is_cached(self.other_post))
+        self.assertContains(self.get_index(), 'Лев Толстой')
+
+    def test_login_keeps_author_cards(self):
+        """Вход автора на сайт не сбрасывает его карточки."""
+        self.get_index()
+        update_last_login(None, self.user)
+        self.assertTrue(self.is_cached(self.post))
+
+    def test_delete_forgets_card(self):
+        """Удаленный пост пропадает из кеша карточек."""
+        self.get_index()
+        key = card_key(self.post.pk, self.post.updated, 'author')
+        self.post.delete()
+        self.assertNotIn(key, cache)
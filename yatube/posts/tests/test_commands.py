@@ -0,0 +1,317 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import activity
+from posts.counts import repair_counters
+from posts.management.commands import import_posts as import_command
+from posts.management.commands.import_posts import insert_posts
+from posts.models import (ActivityTotal, Follow, Group, Post, Profile,
+                          TimelineEntry, User)
+
+
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='books',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_posts(self, path, *args):
+        out, self.errors = StringIO(), StringIO()
+        call_command('import_posts', path, *args, stdout=out,
+                     stderr=self.errors)
+        return out.getvalue()
+
+    def test_import_jsonl_in_batches(self):
+        """Посты из JSONL записываются пачками с исходной датой."""
+        rows = [
+            {
+                'text': f'Пост {number}',
+                'author': 'leo',
+                'group': 'books',
+                'pub_date': f'2001-02-0{number + 1}T10:00:00+00:00',
+            }
+            for number in range(5)
+        ]
+        path = self.write_file(
+            'posts.jsonl', '\n'.join(json.dumps(row) for row in rows)
+        )
+        output = self.import_posts(path, '--batch-size', '2')
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 5)
+        self.assertEqual(
+            Post.objects.get(text='Пост 0').pub_date,
+            datetime(2001, 2, 1, 10, tzinfo=timezone.utc),
+        )
+        self.assertEqual(output.count('строк/с'), 3)
+
+    def test_import_csv_skips_unknown_authors(self):
+        """Строки с неизвестным автором пропускаются, группа не обязательна."""
+        path = self.write_file(
+            'posts.csv',
+            'text,author,group,pub_date\n'
+            'Первый,leo,,\n'
+            'Второй,ghost,books,\n'
+            'Третий,leo,missing,2001-02-01 10:00:00\n',
+        )
+        output = self.import_posts(path)
+        self.assertEqual(
+            set(Post.objects.values_list('text', 'group')),
+            {('Первый', None), ('Третий', None)},
+        )
+        self.assertIn('пропущено 1', output)
+        errors = self.errors.getvalue()
+        self.assertIn('Строка 3: пропущена', errors)
+        self.assertIn("Строка 4: группы 'missing' нет", errors)
+
+    def test_import_skips_malformed_lines(self):
+        """Битые строки JSONL и не объекты пропускаются с сообщением."""
+        path = self.write_file('posts.jsonl', '\n'.join([
+            json.dumps({'text': 'Первый', 'author': 'leo'}),
+            '{"text": ',
+            json.dumps(['не', 'объект']),
+            json.dumps({'text': 'Четвертый', 'author': ['leo']}),
+            json.dumps({'text': 'Пятый', 'author': 'leo'}),
+        ]))
+        output = self.import_posts(path)
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Первый', 'Пятый'},
+        )
+        self.assertIn('пропущено 3', output)
+        errors = self.errors.getvalue()
+        for number in (2, 3, 4):
+            with self.subTest(line=number):
+                self.assertIn(f'Строка {number}: пропущена', errors)
+
+    def test_interrupted_import_refreshes_counters(self):
+        """Если импорт оборвался, счетчики учитывают записанные пачки."""
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps({'text': f'Пост {number}', 'author': 'leo',
+                        'group': 'books'})
+            for number in range(3)
+        ))
+        calls = []
+
+        def fail_second_batch(posts):
+            calls.append(posts)
+            if len(calls) == 2:
+                raise DatabaseError('диск переполнен')
+            return insert_posts(posts)
+
+        with mock.patch.object(
+            import_command, 'insert_posts', side_effect=fail_second_batch
+        ):
+            with self.assertRaises(DatabaseError):
+                self.import_posts(path, '--batch-size', '2')
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 2)
+
+    def test_import_updates_counters_and_pages(self):
+        """После импорта счетчики и закешированные страницы актуальны."""
+        group_address = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}
+        )
+        self.guest_client.get(group_address)
+        path = self.write_file(
+            'posts.jsonl',
+            json.dumps({'text': 'Импорт', 'author': 'leo', 'group': 'books'}),
+        )
+        self.import_posts(path)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 1)
+        self.assertContains(self.guest_client.get(group_address), 'Импорт')
+
+    def test_import_fills_timelines_and_activity(self):
+        """Импортированные посты попадают в ленты подписчиков и в
+        статистику публикаций, как опубликованные через сайт."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        path = self.write_file('posts.jsonl', '\n'.join([
+            json.dumps({'text': 'Свежий', 'author': 'leo',
+                        'group': 'books'}),
+            json.dumps({'text': 'Старый', 'author': 'leo',
+                        'pub_date': '2001-02-01T10:00:00+00:00'}),
+        ]))
+        self.import_posts(path)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=reader)
+                .values_list('post__text', flat=True)),
+            {'Свежий', 'Старый'},
+        )
+        self.assertEqual(
+            dict(ActivityTotal.objects.values_list('group', 'posts')),
+            {self.group.pk: 1, None: 1},
+        )
+        activity.rollup()
+        self.assertEqual(
+            ActivityTotal.objects.get(author=self.user).posts, 1
+        )
+
+
+class ExportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='books',
+            description='Тестовое описание',
+        )
+        cls.old_post = Post.objects.create(
+            text='Старый, "с кавычками"\nи переносом',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.new_post = Post.objects.create(text='Новый', author=cls.user)
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=datetime(2001, 2, 1, 10, tzinfo=timezone.utc)
+        )
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def export_posts(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('export_posts', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_export_jsonl_to_gzip(self):
+        """Выгрузка в .gz сжимается и идет по возрастанию даты."""
+        path = os.path.join(self.tmp_dir.name, 'posts.jsonl.gz')
+        _, err = self.export_posts('--output', path, '--chunk-size', '1')
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(
+            [(row['id'], row['author'], row['group']) for row in rows],
+            [
+                (self.old_post.pk, 'leo', 'books'),
+                (self.new_post.pk, 'leo', None),
+            ],
+        )
+        self.assertEqual(rows[0]['text'], self.old_post.text)
+        self.assertIn(f'--after-id {self.new_post.pk}', err)
+
+    def test_export_filters(self):
+        """--since и --after-id отсекают уже выгруженные посты."""
+        out, _ = self.export_posts('--since', '2010-01-01')
+        self.assertEqual(
+            [json.loads(line)['id'] for line in out.splitlines()],
+            [self.new_post.pk],
+        )
+        out, _ = self.export_posts('--after-id', str(self.new_post.pk))
+        self.assertEqual(out, '')
+
+    def test_export_csv_round_trip(self):
+        """CSV-выгрузка читается командой import_posts."""
+        path = os.path.join(self.tmp_dir.name, 'posts.csv')
+        self.export_posts('--format', 'csv', '--output', path)
+        with open(path, encoding='utf-8', newline='') as file:
+            self.assertEqual(
+                file.readline(), 'id,text,pub_date,author,group\r\n'
+            )
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get(group=self.group)
+        self.assertEqual(post.text, self.old_post.text)
+        self.assertEqual(
+            post.pub_date, datetime(2001, 2, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_export_view_for_staff_only(self):
+        """Выгрузку по HTTP получает только персонал."""
+        address = reverse('posts:export')
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(address).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client.force_login(staff)
+        response = client.get(
+            address, {'format': 'csv', 'since': '2010-01-01'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.new_post.pk},Новый,'))
+        self.assertEqual(
+            client.get(address, {'format': 'xml'}).status_code, 400
+        )
+
+
+class WarmCacheCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='books',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(25)
+        )
+        repair_counters()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def warm_cache(self, *args):
+        out = StringIO()
+        call_command('warm_cache', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_warmed_pages_need_no_queries(self):
+        """После прогрева гости получают ленты без запросов к базе."""
+        output = self.warm_cache('--pages', '5')
+        self.assertIn('главная: 3 страниц', output)
+        self.assertIn('группы: 1 страниц', output)
+        self.assertIn('профили: 1 страниц', output)
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'books'}),
+            reverse('posts:profile', kwargs={'username': 'leo'}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                with self.assertNumQueries(0):
+                    self.guest_client.get(address)
+
+    def test_limits(self):
+        """Число страниц и авторов ограничивается параметрами."""
+        output = self.warm_cache('--pages', '1', '--authors', '0')
+        self.assertIn('главная: 1 страниц', output)
+        self.assertIn('профили: 0 страниц', output)
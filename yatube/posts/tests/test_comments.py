@@ -0,0 +1,175 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import page_cache
+from posts.models import Comment, Group, Post, User
+from posts.views import COMMENTS_ON_PAGE
+
+
+class CommentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='first', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='second', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.detail_address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.comment_address = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+
+    def add_comments(self, total):
+        for number in range(total):
+            Comment.objects.create(
+                post=self.post,
+                author=self.reader,
+                text=f'Комментарий {number}',
+            )
+
+    def test_reader_adds_comment(self):
+        """Комментарий сохраняется и виден на странице поста."""
+        response = self.reader_client.post(
+            self.comment_address, {'text': 'Новый комментарий'}
+        )
+        self.assertRedirects(response, self.detail_address)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.reader)
+        self.assertEqual(comment.post, self.post)
+        response = self.reader_client.get(self.detail_address)
+        self.assertEqual(list(response.context['page_obj']), [comment])
+        self.assertContains(response, 'Новый комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_guest_cannot_comment(self):
+        """Гостя отправляют на вход, комментарий не создается."""
+        response = Client().post(self.comment_address, {'text': 'Текст'})
+        self.assertRedirects(
+            response,
+            f'{reverse("users:login")}?next={self.comment_address}',
+        )
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comments_count_follows_deletes(self):
+        """Счетчик комментариев уменьшается при удалении."""
+        self.add_comments(3)
+        Comment.objects.first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+    def test_post_delete_skips_comment_counters(self):
+        """Удаление поста не пересчитывает счетчик и ленты на каждый его
+        комментарий: запросов столько же, сколько без комментариев."""
+        def delete_queries(post):
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        without_comments = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        expected = delete_queries(without_comments)
+        self.add_comments(5)
+        self.assertEqual(delete_queries(self.post), expected + 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comments_count_stays_at_zero(self):
+        """Удаление комментария не уводит разошедшийся счетчик в минус."""
+        self.add_comments(1)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        Comment.objects.get().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_comments_are_paginated(self):
+        """Комментарии выводятся постранично."""
+        self.add_comments(COMMENTS_ON_PAGE + 5)
+        first = self.reader_client.get(self.detail_address)
+        second = self.reader_client.get(self.detail_address + '?page=2')
+        self.assertEqual(len(first.context['page_obj']), COMMENTS_ON_PAGE)
+        self.assertEqual(len(second.context['page_obj']), 5)
+        self.assertEqual(first.context['page_obj'].paginator.count, 25)
+
+    def test_detail_queries_do_not_depend_on_comments(self):
+        """Авторы комментариев грузятся тем же запросом, что и комментарии."""
+        self.add_comments(1)
+        with self.assertNumQueries(5):
+            self.reader_client.get(self.detail_address)
+        self.add_comments(COMMENTS_ON_PAGE)
+        with self.assertNumQueries(5):
+            self.reader_client.get(self.detail_address)
+
+    def test_feed_shows_denormalized_count(self):
+        """Карточка в ленте показывает число комментариев без запроса
+        на каждый пост и обновляется после нового комментария."""
+        index = reverse('posts:index')
+        self.assertContains(self.reader_client.get(index), 'Комментариев: 0')
+        self.add_comments(2)
+        self.reader_client.get(index)
+        with self.assertNumQueries(3):
+            response = self.reader_client.get(index)
+        self.assertContains(response, 'Комментариев: 2')
+
+    def test_comment_keeps_unrelated_feeds_cached(self):
+        """Комментарий не сбрасывает страниц ни одной ленты, а валидаторы
+        меняет только у лент, где есть пост."""
+        scopes = {
+            page_cache.all_posts_scope(): True,
+            page_cache.group_scope(self.group.slug): True,
+            page_cache.author_scope(self.author.username): True,
+            page_cache.group_scope(self.other_group.slug): False,
+            page_cache.author_scope(self.reader.username): False,
+        }
+        versions = {scope: page_cache.get_version(scope) for scope in scopes}
+        states = {scope: page_cache.get_state(scope) for scope in scopes}
+        self.reader_client.post(self.comment_address, {'text': 'Текст'})
+        for scope, touched in scopes.items():
+            with self.subTest(scope=scope):
+                self.assertEqual(
+                    page_cache.get_version(scope), versions[scope]
+                )
+                self.assertEqual(
+                    page_cache.get_state(scope) != states[scope], touched
+                )
+
+    def test_cached_feed_shows_new_comments(self):
+        """Гость видит новый комментарий на странице ленты из кеша,
+        а повторный запрос с прежним ETag не получает 304."""
+        guest_client = Client()
+        index = reverse('posts:index')
+        response = guest_client.get(index)
+        self.assertContains(response, 'Комментариев: 0')
+        self.add_comments(2)
+        with self.assertNumQueries(1):
+            cached = guest_client.get(
+                index, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(cached.status_code, 200)
+        self.assertContains(cached, 'Комментариев: 2')
+
+    def test_detail_etag_changes_with_comments(self):
+        """Страница поста не отдает 304 после нового комментария."""
+        etag = self.reader_client.get(self.detail_address)['ETag']
+        self.add_comments(1)
+        response = self.reader_client.get(
+            self.detail_address, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,132 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.page_cache import get_version, group_scope
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='first',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+        self.feeds = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        self.detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def revalidate(self, address, response, client=None):
+        client = client or self.guest_client
+        return client.get(address, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_feed_answers_not_modified(self):
+        """Неизменная лента отвечает 304 без обращения к базе."""
+        for address in self.feeds:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                with self.assertNumQueries(0):
+                    revalidated = self.revalidate(address, response)
+                self.assertEqual(
+                    revalidated.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_missing_feed_has_no_validators(self):
+        """Лента несуществующей группы или автора отдается без ETag."""
+        for address in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_group_create_changes_feed_version(self):
+        """Создание группы меняет версию ленты по ее адресу."""
+        scope = group_scope('new')
+        version = get_version(scope)
+        Group.objects.create(title='Новая', slug='new', description='Текст')
+        self.assertNotEqual(get_version(scope), version)
+
+    def test_if_modified_since_for_guest(self):
+        """Гость получает 304 по If-Modified-Since."""
+        response = self.guest_client.get(self.feeds[0])
+        revalidated = self.guest_client.get(
+            self.feeds[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(revalidated.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_changes_feed_validators(self):
+        """Новый пост делает прежний ETag ленты недействительным."""
+        responses = [self.guest_client.get(address) for address in self.feeds]
+        Post.objects.create(text='Новый', author=self.user, group=self.group)
+        for address, response in zip(self.feeds, responses):
+            with self.subTest(address=address):
+                self.assertEqual(
+                    self.revalidate(address, response).status_code,
+                    HTTPStatus.OK,
+                )
+
+    def test_authorized_user_gets_own_etag(self):
+        """У авторизованного пользователя свой ETag и нет Last-Modified."""
+        guest = self.guest_client.get(self.feeds[0])
+        author = self.author_client.get(self.feeds[0])
+        self.assertNotEqual(guest['ETag'], author['ETag'])
+        self.assertFalse(author.has_header('Last-Modified'))
+        self.assertEqual(
+            self.revalidate(self.feeds[0], guest, self.author_client)
+            .status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_post_detail_validators(self):
+        """Страница поста отвечает 304 одним запросом до правки поста."""
+        response = self.guest_client.get(self.detail)
+        with self.assertNumQueries(1):
+            revalidated = self.revalidate(self.detail, response)
+        self.assertEqual(revalidated.status_code, HTTPStatus.NOT_MODIFIED)
+        self.author_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        self.assertEqual(
+            self.revalidate(self.detail, response).status_code, HTTPStatus.OK
+        )
+
+    def test_author_change_changes_post_detail_etag(self):
+        """Изменение автора меняет ETag страницы его поста."""
+        response = self.guest_client.get(self.detail)
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertEqual(
+            self.revalidate(self.detail, response).status_code, HTTPStatus.OK
+        )
+
+    def test_missing_post_is_not_found(self):
+        """Для несуществующего поста по-прежнему 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
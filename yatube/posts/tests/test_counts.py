@@ -0,0 +1,163 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import counts
+from posts.models import Group, Post, Profile, User
+from posts.paginators import WindowedPage
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.other_user = User.objects.create_user(username='other')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='first',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='second',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+
+    def assertCounters(self, group, other_group, author):
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group)
+        self.assertEqual(self.other_group.posts_count, other_group)
+        self.assertEqual(
+            Profile.objects.get(user=self.user).posts_count, author
+        )
+
+    def test_counters_follow_create(self):
+        """Новый пост увеличивает счетчики группы и автора."""
+        self.author_client.post(
+            reverse('posts:create'),
+            data={'text': 'Еще пост', 'group': self.group.pk},
+        )
+        self.assertCounters(group=2, other_group=0, author=2)
+
+    def test_counters_follow_group_change(self):
+        """Правка поста переносит его между счетчиками групп."""
+        self.author_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Тестовый пост', 'group': self.other_group.pk},
+        )
+        self.assertCounters(group=0, other_group=1, author=1)
+
+    def test_counters_follow_author_change(self):
+        """Смена автора переносит пост между счетчиками профилей."""
+        self.post.author = self.other_user
+        self.post.save()
+        self.assertEqual(
+            Profile.objects.get(user=self.other_user).posts_count, 1
+        )
+        self.assertCounters(group=1, other_group=0, author=0)
+
+    def test_counters_follow_delete(self):
+        """Удаление поста уменьшает счетчики группы и автора."""
+        self.post.delete()
+        self.assertCounters(group=0, other_group=0, author=0)
+
+    def test_deleting_uncounted_post_keeps_counters_at_zero(self):
+        """Удаление поста, не попавшего в счетчики, их не ломает."""
+        self.post.delete()
+        Post.objects.bulk_create([
+            Post(text='Мимо счетчиков', author=self.user, group=self.group)
+        ])
+        Post.objects.get(text='Мимо счетчиков').delete()
+        self.assertCounters(group=0, other_group=0, author=0)
+
+    def test_group_delete_keeps_author_counter(self):
+        """Удаление группы не меняет число постов автора."""
+        self.group.delete()
+        self.assertEqual(
+            Profile.objects.get(user=self.user).posts_count, 1
+        )
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.group)
+
+    def test_pages_show_counters(self):
+        """Страницы берут число постов из счетчиков."""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        Profile.objects.filter(user=self.user).update(posts_count=5)
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 7)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, 'Всего постов автора: 5')
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        )
+        self.assertContains(response, 'Всего постов: 5')
+
+    def test_recount_posts_repairs_drift(self):
+        """Команда recount_posts исправляет разошедшиеся счетчики."""
+        Post.objects.bulk_create(
+            Post(text='Пакет', author=self.user, group=self.other_group)
+            for _ in range(3)
+        )
+        Group.objects.filter(pk=self.group.pk).update(posts_count=9)
+        Profile.objects.filter(user=self.user).delete()
+        call_command('recount_posts', verbosity=0)
+        self.assertCounters(group=1, other_group=3, author=4)
+        self.assertEqual(
+            Profile.objects.get(user=self.other_user).posts_count, 0
+        )
+
+
+class AllPostsCountTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user')
+
+    def test_count_changes_after_commit_only(self):
+        """Общий счетчик сдвигается после коммита, откат его не меняет."""
+        self.assertEqual(counts.all_posts_count(), 0)
+        Post.objects.create(text='Пост', author=self.user)
+        self.assertEqual(counts.all_posts_count(), 1)
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Post.objects.create(text='Откатится', author=self.user)
+                raise ValueError
+        self.assertEqual(counts.all_posts_count(), 1)
+        Post.objects.get().delete()
+        self.assertEqual(counts.all_posts_count(), 0)
+
+
+class WindowedPageTest(TestCase):
+    def get_window(self, number, posts=1000):
+        paginator = Paginator(range(posts), 10)
+        return WindowedPage([], number, paginator).page_window
+
+    def test_page_window(self):
+        """Пагинатор показывает окно страниц вместо полного списка."""
+        cases = {
+            (1, 1000): [1, 2, 3, None, 100],
+            (50, 1000): [1, None, 48, 49, 50, 51, 52, None, 100],
+            (100, 1000): [1, None, 98, 99, 100],
+            (4, 1000): [1, 2, 3, 4, 5, 6, None, 100],
+            (2, 30): [1, 2, 3],
+        }
+        for (number, posts), window in cases.items():
+            with self.subTest(number=number, posts=posts):
+                self.assertEqual(self.get_window(number, posts), window)
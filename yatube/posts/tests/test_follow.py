@@ -0,0 +1,245 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, Profile, TimelineEntry, User
+
+
+class FollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_feed(self, client=None, cursor=None):
+        address = reverse('posts:follow_index')
+        if cursor:
+            address += f'?cursor={cursor}'
+        response = (client or self.reader_client).get(address)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def follow(self, user, author):
+        client = Client()
+        client.force_login(user)
+        client.get(
+            reverse('posts:profile_follow', kwargs={'username': author})
+        )
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют Follow, счетчик и ленту подписок."""
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        response = self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertRedirects(
+            response, reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertEqual(list(self.follow_feed()), [post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            Profile.objects.get(user=self.author).followers_count, 0
+        )
+        self.assertEqual(list(self.follow_feed()), [])
+
+    def test_cannot_follow_self(self):
+        """На себя подписаться нельзя."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'reader'})
+        )
+        self.assertFalse(Follow.objects.exists())
+
+    def test_profile_shows_follow_button(self):
+        """Кнопка на странице автора зависит от подписки."""
+        address = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertFalse(self.reader_client.get(address).context['following'])
+        self.follow(self.reader, self.author)
+        self.assertTrue(self.reader_client.get(address).context['following'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков, и только их."""
+        self.follow(self.reader, self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(list(self.follow_feed()), [post])
+        stranger_client = Client()
+        stranger_client.force_login(self.stranger)
+        self.assertEqual(list(self.follow_feed(stranger_client)), [])
+
+    def test_post_create_view_fans_out(self):
+        """Пост из формы сразу виден в ленте подписчика."""
+        self.follow(self.reader, self.author)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(reverse('posts:create'), {'text': 'Из формы'})
+        self.assertEqual(
+            [post.text for post in self.follow_feed()], ['Из формы']
+        )
+
+    @override_settings(TIMELINE_FANOUT_BATCH=2)
+    def test_fan_out_is_batched(self):
+        """Строки ленты пишутся пачками по TIMELINE_FANOUT_BATCH."""
+        followers = [
+            User.objects.create_user(username=f'follower{number}')
+            for number in range(5)
+        ]
+        for follower in followers:
+            self.follow(follower, self.author)
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(text='Пост', author=self.author)
+        inserts = [
+            query for query in queries
+            if 'INSERT' in query['sql']
+            and 'posts_timelineentry' in query['sql']
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(post.timeline_entries.count(), 5)
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Посты знаменитости не раскладываются, но видны в ленте по порядку
+        вместе с разложенными, в том числе на следующих страницах."""
+        self.follow(self.stranger, self.star)
+        self.follow(self.reader, self.star)
+        self.follow(self.reader, self.author)
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=self.star if number % 3 else self.author,
+            )
+            for number in range(15)
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        first_page = self.follow_feed()
+        second_page = self.follow_feed(cursor=first_page.next_cursor)
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual([post.pk for post in first_page], expected[:10])
+        self.assertEqual([post.pk for post in second_page], expected[10:])
+        self.assertFalse(second_page.has_next())
+        previous_page = self.follow_feed(cursor=second_page.previous_cursor)
+        self.assertEqual([post.pk for post in previous_page], expected[:10])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2,
+                       TIMELINE_BACKFILL_DELAY=0)
+    def test_former_celebrity_is_backfilled(self):
+        """Когда подписчиков стало меньше порога, посты раскладываются по
+        лентам командой, а до того подмешиваются при чтении."""
+        self.follow(self.stranger, self.star)
+        self.follow(self.reader, self.star)
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        self.assertFalse(post.timeline_entries.exists())
+        Follow.objects.filter(user=self.stranger).delete()
+        self.assertFalse(post.timeline_entries.exists())
+        self.assertEqual(list(self.follow_feed()), [post])
+        out = StringIO()
+        call_command('backfill_timelines', stdout=out)
+        self.assertIn('авторов: 1', out.getvalue())
+        self.assertEqual(
+            list(post.timeline_entries.values_list('user', flat=True)),
+            [self.reader.pk],
+        )
+        self.assertEqual(list(self.follow_feed()), [post])
+        self.assertIsNone(
+            Profile.objects.get(user=self.star).backfill_requested
+        )
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_backfill_waits_for_threshold_to_settle(self):
+        """Отписки и подписки на пороге не раскладывают посты, пока число
+        подписчиков не продержится ниже порога TIMELINE_BACKFILL_DELAY."""
+        self.follow(self.reader, self.star)
+        self.follow(self.stranger, self.star)
+        Post.objects.create(text='Пост звезды', author=self.star)
+        for _ in range(3):
+            Follow.objects.filter(user=self.stranger).delete()
+            self.follow(self.stranger, self.star)
+        Follow.objects.filter(user=self.stranger).delete()
+        requested = Profile.objects.get(user=self.star).backfill_requested
+        self.assertEqual(timeline.backfill_due(requested), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.follow(self.stranger, self.star)
+        self.assertEqual(timeline.backfill_due(
+            requested + timedelta(seconds=settings.TIMELINE_BACKFILL_DELAY)
+        ), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertIsNone(
+            Profile.objects.get(user=self.star).backfill_requested
+        )
+
+    def test_changed_author_moves_post_between_timelines(self):
+        """Пост, переданный другому автору, уходит к его подписчикам."""
+        self.follow(self.reader, self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.author = self.star
+        post.save()
+        self.assertEqual(list(self.follow_feed()), [])
+
+    def test_guest_is_redirected(self):
+        """Лента подписок только для авторизованных."""
+        response = Client().get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class TimelineQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(15):
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+
+    def test_page_is_one_index_range_scan(self):
+        """Страница ленты - один запрос по индексу ленты без сортировки."""
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        for address in (
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index')
+            + f'?cursor={response.context["page_obj"].next_cursor}',
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                client.get(address)
+            timeline_sql = [
+                query['sql'] for query in queries
+                if 'FROM "posts_timelineentry"' in query['sql']
+            ]
+            self.assertEqual(len(timeline_sql), 1)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + timeline_sql[0])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            with self.subTest(address=address):
+                self.assertRegex(
+                    plan, r'USING (COVERING )?INDEX timeline_user_pub_date_idx'
+                )
+                self.assertNotIn('TEMP B-TREE', plan)
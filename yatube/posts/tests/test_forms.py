@@ -1,5 +1,13 @@
-from django.test import Client, TestCase
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post, User
 
@@ -72,3 +80,82 @@ class PostFormTests(TestCase):
                 text='Тестовый текст!',
             ).exists()
         )
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(name='photo.jpg', size=(3000, 1000), color='red'):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Камера'
+    Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=600)
+class PostImageFormTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.author)
+
+    def create_post(self, image):
+        return self.authorized_user.post(
+            reverse('posts:create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    def test_upload_is_normalized(self):
+        """Картинка уменьшается, пережимается в WebP и теряет EXIF."""
+        self.create_post(make_upload())
+        post = Post.objects.get()
+        self.assertRegex(
+            post.image.name, r'^posts/(\w\w)/(\w\w)/\1\2[0-9a-f]{60}\.webp$'
+        )
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (200, 600))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки ссылаются на один файл."""
+        self.create_post(make_upload('first.jpg'))
+        self.create_post(make_upload('second.jpg'))
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(
+            os.listdir(os.path.dirname(os.path.join(TEMP_MEDIA_ROOT, name))),
+            [os.path.basename(name)],
+        )
+
+    def test_edit_keeps_image(self):
+        """Правка без новой картинки оставляет прежнюю."""
+        self.create_post(make_upload())
+        post = Post.objects.get()
+        self.authorized_user.post(
+            reverse('posts:edit', kwargs={'post_id': post.id}),
+            data={'text': 'Новый текст'},
+        )
+        image_name = post.image.name
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, image_name)
+
+    def test_not_an_image_is_rejected(self):
+        """Файл, который не картинка, не сохраняется."""
+        response = self.create_post(
+            SimpleUploadedFile('fake.jpg', b'not an image', 'image/jpeg')
+        )
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
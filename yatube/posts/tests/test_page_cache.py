@@ -0,0 +1,139 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import page_cache
+from posts.models import Group, Post, User
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='first',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='second',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+        self.feeds = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+
+    def warm_feeds(self):
+        for address in self.feeds:
+            self.guest_client.get(address)
+
+    def test_guest_pages_are_cached(self):
+        """Повторный показ ленты гостю не обращается к базе."""
+        self.warm_feeds()
+        for address in self.feeds:
+            with self.subTest(address=address):
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(address)
+                self.assertContains(response, 'Тестовый пост')
+
+    def test_unknown_params_share_cached_page(self):
+        """Посторонние параметры адреса не создают новых записей кеша."""
+        self.warm_feeds()
+        for address in self.feeds:
+            with self.subTest(address=address):
+                with self.assertNumQueries(0):
+                    self.guest_client.get(f'{address}?utm_source=x&ref=1')
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный пользователь получает свежую страницу."""
+        self.warm_feeds()
+        for address in self.feeds:
+            with self.subTest(address=address):
+                response = self.author_client.get(address)
+                self.assertIn('page_obj', response.context)
+                self.assertContains(response, 'Пользователь: user')
+
+    def test_new_post_reaches_cached_pages(self):
+        """Новый пост сразу появляется на закешированных страницах."""
+        self.warm_feeds()
+        self.author_client.post(
+            reverse('posts:create'),
+            data={'text': 'Свежий пост', 'group': self.group.pk},
+        )
+        for address in self.feeds:
+            with self.subTest(address=address):
+                self.assertContains(
+                    self.guest_client.get(address), 'Свежий пост'
+                )
+
+    def test_edit_keeps_unrelated_group_page(self):
+        """Правка поста не сбрасывает страницу чужой группы."""
+        other_address = reverse(
+            'posts:group_list', kwargs={'slug': self.other_group.slug}
+        )
+        self.guest_client.get(other_address)
+        self.author_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        with self.assertNumQueries(0):
+            self.guest_client.get(other_address)
+
+    def test_group_move_updates_both_group_pages(self):
+        """Перенос поста в другую группу обновляет обе страницы групп."""
+        other_address = reverse(
+            'posts:group_list', kwargs={'slug': self.other_group.slug}
+        )
+        self.warm_feeds()
+        self.guest_client.get(other_address)
+        self.author_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Тестовый пост', 'group': self.other_group.pk},
+        )
+        self.assertNotContains(
+            self.guest_client.get(self.feeds[1]), 'Тестовый пост'
+        )
+        self.assertContains(
+            self.guest_client.get(other_address), 'Тестовый пост'
+        )
+
+    def test_renamed_group_page_is_not_served(self):
+        """Старый адрес переименованной группы больше не открывается."""
+        group = Group.objects.create(
+            title='Временная группа',
+            slug='temporary',
+            description='Тестовое описание',
+        )
+        address = reverse('posts:group_list', kwargs={'slug': group.slug})
+        self.guest_client.get(address)
+        group.slug = 'renamed'
+        group.save()
+        self.assertEqual(self.guest_client.get(address).status_code, 404)
+
+
+class CommitBumpTest(TransactionTestCase):
+    def test_version_is_bumped_again_after_commit(self):
+        """Страница, закешированная до коммита, недоступна после него."""
+        cache.clear()
+        user = User.objects.create_user(username='user')
+        scope = page_cache.all_posts_scope()
+        before = page_cache.get_version(scope)
+        with transaction.atomic():
+            Post.objects.create(text='Пост', author=user)
+            during = page_cache.get_version(scope)
+            self.assertNotEqual(during, before)
+        self.assertNotEqual(page_cache.get_version(scope), during)
@@ -0,0 +1,65 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counts import repair_counters
+from posts.models import Group, Post, User
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text='Тестовый текст', author=cls.user, group=cls.group)
+            for _ in range(25)
+        )
+        repair_counters()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_feed_plan(self, address):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(address)
+        feed_sql = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "posts_post"."id"')
+        ]
+        self.assertEqual(len(feed_sql), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + feed_sql[0])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        return response, plan
+
+    def test_feeds_are_read_by_index(self):
+        """Ленты читаются по индексу без сортировки во временном B-tree."""
+        response, _ = self.get_feed_plan(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        feeds = {
+            reverse('posts:index'): 'post_pub_date_idx',
+            f'{reverse("posts:index")}?cursor={cursor}': 'post_pub_date_idx',
+            f'{reverse("posts:index")}?page=2': 'post_pub_date_idx',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                'post_group_pub_date_idx',
+            reverse('posts:profile', kwargs={'username': self.user.username}):
+                'post_author_pub_date_idx',
+        }
+        for address, index in feeds.items():
+            with self.subTest(address=address):
+                _, plan = self.get_feed_plan(address)
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,114 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post, User
+from posts.signals import restore_search_triggers
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def found(self, query):
+        return search.search_post_ids(query, limit=100)[0]
+
+    def test_index_follows_changes(self):
+        """Индекс видит создание, правку и удаление постов."""
+        post = Post.objects.create(text='Рыжий кот', author=self.user)
+        self.assertEqual(self.found('кот'), [post.pk])
+        post.text = 'Серый пес'
+        post.save()
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(self.found('пес'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('пес'), [])
+
+    def test_index_follows_bulk_changes(self):
+        """bulk_create и update() тоже попадают в индекс."""
+        Post.objects.bulk_create(
+            Post(text=f'Заметка {number}', author=self.user)
+            for number in range(3)
+        )
+        self.assertEqual(len(self.found('заметка')), 3)
+        post = Post.objects.get(text='Заметка 0')
+        Post.objects.filter(pk=post.pk).update(text='Черновик')
+        self.assertEqual(self.found('черновик'), [post.pk])
+        self.assertEqual(len(self.found('заметка')), 2)
+
+    def test_ranked_keyset_pages(self):
+        """Результаты идут по релевантности и листаются без повторов."""
+        best = Post.objects.create(text='чай чай чай', author=self.user)
+        others = [
+            Post.objects.create(text=f'чай и кофе {number}', author=self.user)
+            for number in range(4)
+        ]
+        post_ids, cursor = search.search_post_ids('чай', limit=2)
+        self.assertEqual(post_ids[0], best.pk)
+        seen = list(post_ids)
+        while cursor:
+            post_ids, cursor = search.search_post_ids('чай', cursor, limit=2)
+            seen += post_ids
+        self.assertCountEqual(seen, [best.pk] + [post.pk for post in others])
+
+    def test_query_syntax_is_escaped(self):
+        """Спецсимволы FTS в запросе не ломают поиск, префикс работает."""
+        post = Post.objects.create(text='Программирование', author=self.user)
+        for query in ('"', 'OR (', 'NEAR(', '*', ''):
+            self.assertEqual(self.found(query), [])
+        self.assertEqual(self.found('AND програм'), [])
+        self.assertEqual(self.found('програм'), [post.pk])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты и ссылку дальше."""
+        for number in range(12):
+            Post.objects.create(text=f'Поиск номер {number}', author=self.user)
+        Post.objects.create(text='Не про то', author=self.user)
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'номер'}
+        )
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertNotContains(response, 'Не про то')
+        response = self.guest_client.get(
+            reverse('posts:search'),
+            {'q': 'номер', 'cursor': response.context['next_cursor']},
+        )
+        self.assertEqual(len(response.context['posts']), 2)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет через полнотекстовый индекс."""
+        Post.objects.create(text='Искомый пост', author=self.user)
+        Post.objects.create(text='Другой пост', author=self.user)
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'искомый'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_triggers_restored_after_migrate(self):
+        """post_migrate возвращает триггеры, потерянные при пересоздании."""
+        with connection.cursor() as cursor:
+            for action in ('insert', 'delete', 'update'):
+                cursor.execute(
+                    f'DROP TRIGGER {search.SEARCH_TABLE}_{action}'
+                )
+        restore_search_triggers(
+            sender=apps.get_app_config('posts'), using='default'
+        )
+        post = Post.objects.create(text='После миграции', author=self.user)
+        self.assertEqual(self.found('миграции'), [post.pk])
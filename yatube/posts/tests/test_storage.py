@@ -0,0 +1,151 @@
+import os
+import shutil
+import stat
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TransactionTestCase, override_settings
+
+from posts import images
+from posts.models import Post, User
+from posts.storage import ContentAddressedStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-1] + b'\x00\x3B'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+    """Файлы удаляются в on_commit, поэтому нужны настоящие коммиты."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+
+    def create_post(self, content=SMALL_GIF):
+        post = Post(text='Пост', author=self.user)
+        post.image.save('upload.gif', ContentFile(content), save=False)
+        post.save()
+        return post
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковое содержимое получает одно имя в шардированном каталоге."""
+        storage = ContentAddressedStorage()
+        first = storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        second = storage.save('posts/b.GIF', ContentFile(SMALL_GIF))
+        self.assertEqual(first, second)
+        directory, shard, subshard, filename = first.split('/')
+        self.assertEqual(directory, 'posts')
+        self.assertEqual(filename[:4], shard + subshard)
+        self.assertTrue(filename.endswith('.gif'))
+        self.assertEqual(
+            [name for name in os.listdir(TEMP_MEDIA_ROOT)
+             if name.startswith('.upload-')],
+            [],
+        )
+
+    def test_file_mode_matches_file_system_storage(self):
+        """Права файла как у обычного хранилища, а не 0600 от mkstemp."""
+        name = ContentAddressedStorage().save(
+            'posts/a.gif', ContentFile(SMALL_GIF)
+        )
+        plain = FileSystemStorage().save('plain.gif', ContentFile(SMALL_GIF))
+        mode = os.stat(os.path.join(TEMP_MEDIA_ROOT, name)).st_mode
+        self.assertEqual(
+            stat.S_IMODE(mode),
+            stat.S_IMODE(os.stat(FileSystemStorage().path(plain)).st_mode),
+        )
+        self.assertTrue(mode & stat.S_IROTH)
+        with override_settings(FILE_UPLOAD_PERMISSIONS=0o640):
+            name = ContentAddressedStorage().save(
+                'posts/b.gif', ContentFile(OTHER_GIF)
+            )
+        self.assertEqual(stat.S_IMODE(
+            os.stat(os.path.join(TEMP_MEDIA_ROOT, name)).st_mode
+        ), 0o640)
+
+    def test_file_removed_with_last_post(self):
+        """Файл живет, пока на него ссылается хотя бы один пост."""
+        first, second = self.create_post(), self.create_post()
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        first.delete()
+        self.assertTrue(self.exists(name))
+        second.delete()
+        self.assertFalse(self.exists(name))
+
+    def test_replaced_image_is_removed(self):
+        """Замененная картинка без других ссылок удаляется."""
+        post = self.create_post()
+        old_name = post.image.name
+        post.image.save('new.gif', ContentFile(OTHER_GIF), save=False)
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(self.exists(old_name))
+        self.assertTrue(self.exists(post.image.name))
+
+    def release_during_move(self, name, action):
+        """Выполнить action, пока release_image держит файл в стороне."""
+        replace = os.replace
+        actions = [action]
+
+        def move_aside(source, target):
+            replace(source, target)
+            if actions and target.endswith('.released'):
+                actions.pop()()
+
+        with mock.patch('posts.images.os.replace', side_effect=move_aside):
+            return images.release_image(name)
+
+    def test_post_saved_during_release_keeps_file(self):
+        """Пост, сославшийся на файл во время удаления, его сохраняет."""
+        name = ContentAddressedStorage().save(
+            'posts/a.gif', ContentFile(SMALL_GIF)
+        )
+        released = self.release_during_move(
+            name,
+            lambda: Post.objects.create(
+                text='Пост', author=self.user, image=name
+            ),
+        )
+        self.assertFalse(released)
+        self.assertTrue(self.exists(name))
+
+    def test_upload_during_release_recreates_file(self):
+        """Загрузка того же содержимого во время удаления кладет файл
+        заново."""
+        name = ContentAddressedStorage().save(
+            'posts/a.gif', ContentFile(SMALL_GIF)
+        )
+        released = self.release_during_move(
+            name,
+            lambda: ContentAddressedStorage().save(
+                'posts/b.gif', ContentFile(SMALL_GIF)
+            ),
+        )
+        self.assertTrue(released)
+        self.assertTrue(self.exists(name))
+        self.assertEqual(
+            [path for path in os.listdir(os.path.dirname(
+                os.path.join(TEMP_MEDIA_ROOT, name)
+            )) if path.endswith('.released')],
+            [],
+        )
@@ -0,0 +1,164 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailTask, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-1] + b'\x00\x3B'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TransactionTestCase):
+    """Потоки воркера ходят в базу своими соединениями, им нужен коммит."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, content=SMALL_GIF):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', content, 'image/gif'),
+        )
+
+    def run_worker(self):
+        out = StringIO()
+        call_command(
+            'thumbnail_worker', '--once', '--workers', '2', stdout=out
+        )
+        return out.getvalue()
+
+    def get_index(self):
+        return self.client.get(reverse('posts:index'))
+
+    def test_upload_is_queued_with_placeholder(self):
+        """Новая картинка ставится в очередь, в ленте пока заглушка."""
+        post = self.create_post()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertEqual(
+            list(ThumbnailTask.objects.values_list('post', 'image')),
+            [(post.pk, post.image.name)],
+        )
+        response = self.get_index()
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_worker_makes_thumbnails(self):
+        """Воркер режет миниатюры, и карточка показывает картинку."""
+        post = self.create_post()
+        self.get_index()
+        output = self.run_worker()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertIn('в очереди: 0', output)
+        response = self.get_index()
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, 'Картинка обрабатывается')
+
+    def test_text_edit_does_not_requeue(self):
+        """Правка текста не ставит картинку в очередь повторно."""
+        post = self.create_post()
+        self.run_worker()
+        post.refresh_from_db()
+        post.text = 'Новый текст'
+        post.save()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertFalse(ThumbnailTask.objects.exists())
+
+    def test_replaced_image_task_is_dropped(self):
+        """Задание для замененной картинки не отмечает пост готовым, даже
+        если воркер прочитал пост до замены."""
+        stale = self.create_post()
+        old_task = ThumbnailTask.objects.get()
+        post = Post.objects.get(pk=stale.pk)
+        post.image = SimpleUploadedFile('other.gif', OTHER_GIF, 'image/gif')
+        post.save()
+        thumbnails.complete_task(old_task)
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertEqual(ThumbnailTask.objects.count(), 1)
+
+    def test_completed_task_keeps_concurrent_edits(self):
+        """Отметка о миниатюрах не затирает правку, сделанную во время
+        нарезки, и обновляет закешированную ленту гостя."""
+        post = self.create_post()
+        task = ThumbnailTask.objects.get()
+        self.client.logout()
+        self.assertContains(self.get_index(), 'Картинка обрабатывается')
+        Post.objects.filter(pk=post.pk).update(text='Правка во время нарезки')
+        thumbnails.make_thumbnails(post.image)
+        thumbnails.complete_task(task)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка во время нарезки')
+        self.assertTrue(post.thumbnails_ready)
+        self.assertNotContains(self.get_index(), 'Картинка обрабатывается')
+
+    @override_settings(THUMBNAIL_QUEUE_LIMIT=1)
+    def test_full_queue_makes_thumbnails_inline(self):
+        """При полной очереди миниатюры режутся прямо при сохранении."""
+        self.create_post()
+        post = self.create_post()
+        self.assertTrue(post.thumbnails_ready)
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(ThumbnailTask.objects.count(), 1)
+
+    @override_settings(THUMBNAIL_QUEUE_LIMIT=1)
+    def test_inline_failure_leaves_task_for_worker(self):
+        """Ошибка нарезки при полной очереди не ломает сохранение поста."""
+        self.create_post()
+        with mock.patch.object(
+            thumbnails, 'make_thumbnails', side_effect=OSError('диск')
+        ), self.assertLogs('posts.thumbnails', 'ERROR'):
+            post = self.create_post(OTHER_GIF)
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertTrue(
+            ThumbnailTask.objects.filter(image=post.image.name).exists()
+        )
+        self.run_worker()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+
+    def test_broken_image_gives_up(self):
+        """Битая картинка после нескольких попыток уходит из очереди."""
+        self.create_post(content=b'not an image')
+        for _ in range(thumbnails.MAX_ATTEMPTS):
+            self.assertIn('ошибок: 1', self.run_worker())
+            self.assertEqual(self.run_worker(), '')
+            ThumbnailTask.objects.update(claimed_at=None)
+        self.assertEqual(self.run_worker(), '')
+        self.assertEqual(
+            thumbnails.queue_stats(),
+            {'depth': 0, 'oldest_age': 0, 'failed': 1},
+        )
+        out = StringIO()
+        call_command('thumbnail_worker', '--stats', stdout=out)
+        self.assertIn('попыток: 1', out.getvalue())
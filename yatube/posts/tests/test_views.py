@@ -1,7 +1,11 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
+from posts.counts import repair_counters
 from posts.models import Group, Post, User
 
 
@@ -34,6 +38,7 @@ class PostViewsTest(TestCase):
         }
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -149,8 +154,10 @@ class PaginatorViewsTest(TestCase):
         for _ in range(0, cls.number_of_posts):
             cls.post.append(Post(author=cls.user, group=cls.group))
         Post.objects.bulk_create(cls.post)
+        repair_counters()
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -166,3 +173,95 @@ class PaginatorViewsTest(TestCase):
                     reverse_ + '?page=2').context.get('page_obj')),
                     self.posts_on_second_page
                 )
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user)
+            for number in range(23)
+        )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_page(self, cursor=None):
+        data = {'cursor': cursor} if cursor else {}
+        return self.guest_client.get(
+            reverse('posts:index'), data
+        ).context['page_obj']
+
+    def test_cursor_pages_follow_each_other(self):
+        """Курсоры ведут по ленте вперед и назад без пропусков."""
+        first = self.get_page()
+        second = self.get_page(first.next_cursor)
+        third = self.get_page(second.next_cursor)
+        self.assertEqual(list(first), self.posts[:10])
+        self.assertEqual(list(second), self.posts[10:20])
+        self.assertEqual(list(third), self.posts[20:])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(self.get_page(third.previous_cursor)), self.posts[10:20]
+        )
+        back = self.get_page(second.previous_cursor)
+        self.assertEqual(list(back), self.posts[:10])
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_skips_count_and_offset(self):
+        """Страница по курсору строится одним запросом без COUNT и OFFSET."""
+        cursor = self.get_page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.get_page(cursor)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_broken_cursor_shows_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        self.assertEqual(list(self.get_page('broken')), self.posts[:10])
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        cls.feed_queries = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list', kwargs={
+                'slug': cls.group.slug}): 4,
+            reverse('posts:profile', kwargs={
+                'username': cls.user.username}): 4,
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_queries_do_not_depend_on_posts_count(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        for posts_count in (1, 10):
+            Post.objects.all().delete()
+            Post.objects.bulk_create(
+                Post(text='Текст', author=self.user, group=self.group)
+                for _ in range(posts_count)
+            )
+            repair_counters()
+            cache.clear()
+            for address, queries in self.feed_queries.items():
+                self.authorized_client.get(address)
+                with self.subTest(address=address, posts=posts_count):
+                    with self.assertNumQueries(queries):
+                        self.authorized_client.get(address)
@@ -0,0 +1,110 @@
+import logging
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from . import cards, page_cache
+from .models import Group, Post, ThumbnailTask, User
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def make_thumbnail(image, name):
+    geometry, options = settings.POST_THUMBNAILS[name]
+    return get_thumbnail(image, geometry, **options)
+
+
+def make_thumbnails(image):
+    """Нарезать все размеры; sorl молча отдает пустую миниатюру при ошибке."""
+    for name in settings.POST_THUMBNAILS:
+        if not make_thumbnail(image, name).exists():
+            raise ValueError(f'Не удалось нарезать {image.name}')
+
+
+def pending_tasks():
+    return ThumbnailTask.objects.filter(attempts__lt=MAX_ATTEMPTS)
+
+
+def queue_stats():
+    """Глубина очереди, возраст старого задания и число сдавшихся заданий."""
+    pending = pending_tasks().aggregate(oldest=Min('created'))
+    oldest = pending['oldest']
+    return {
+        'depth': pending_tasks().count(),
+        'oldest_age': (
+            (timezone.now() - oldest).total_seconds() if oldest else 0
+        ),
+        'failed': ThumbnailTask.objects.filter(
+            attempts__gte=MAX_ATTEMPTS
+        ).count(),
+    }
+
+
+def enqueue(post):
+    """Поставить нарезку в очередь, а при переполнении нарезать сразу.
+
+    Нарезка в самом запросе притормаживает загрузки до скорости воркера,
+    и очередь не растет без предела. Ошибка такой нарезки не ломает
+    сохранение поста: картинка все равно уходит воркеру.
+    """
+    if pending_tasks().count() < settings.THUMBNAIL_QUEUE_LIMIT:
+        ThumbnailTask.objects.create(post=post, image=post.image.name)
+        return True
+    try:
+        make_thumbnails(post.image)
+    except Exception:
+        logger.exception(
+            'Не удалось нарезать %s при сохранении, задание для воркера',
+            post.image.name,
+        )
+        ThumbnailTask.objects.create(post=post, image=post.image.name)
+        return True
+    Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        thumbnails_ready=True
+    )
+    post.thumbnails_ready = True
+    return False
+
+
+def claim_tasks(limit):
+    """Забрать задания себе; брошенные упавшим воркером вернутся в работу."""
+    token = uuid4().hex
+    now = timezone.now()
+    available = pending_tasks().filter(
+        Q(claimed_at=None) | Q(claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    task_ids = list(available.values_list('pk', flat=True)[:limit])
+    available.filter(pk__in=task_ids).update(claimed_by=token, claimed_at=now)
+    return list(ThumbnailTask.objects.filter(claimed_by=token))
+
+
+def complete_task(task):
+    """Отметить пост, если его картинку не успели заменить, и снять задание.
+
+    Картинку сверяет сам UPDATE: пост, прочитанный воркером до нарезки,
+    мог устареть.
+    """
+    post = Post.objects.filter(pk=task.post_id, image=task.image)
+    versions = list(post.values_list('pk', 'updated'))
+    if post.update(thumbnails_ready=True, updated=timezone.now()):
+        cards.forget_cards(versions)
+        page_cache.bump_feeds(
+            Group.objects.filter(posts__pk=task.post_id),
+            User.objects.filter(posts__pk=task.post_id),
+        )
+    task.delete()
+
+
+def fail_task(task, error):
+    """Снять задание с воркера; повтор будет не раньше CLAIM_TIMEOUT."""
+    task.attempts += 1
+    task.last_error = str(error)
+    task.claimed_by = ''
+    task.save(update_fields=['attempts', 'last_error', 'claimed_by'])
@@ -0,0 +1,202 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FEED_FIELDS, Follow, Post, Profile, TimelineEntry
+from .paginators import NEXT, CursorPaginator, decode_cursor
+
+ENTRY_FIELDS = ('pub_date', 'post', *(f'post__{name}' for name in FEED_FIELDS))
+
+
+def merged_on_read(prefix=''):
+    """Условие на профиль автора, чьи посты подмешиваются при чтении:
+    знаменитости и бывшие знаменитости, чьи ленты еще не дозаполнены."""
+    return Q(**{
+        f'{prefix}followers_count__gte': settings.TIMELINE_CELEBRITY_FOLLOWERS,
+    }) | Q(**{f'{prefix}backfill_requested__isnull': False})
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(merged_on_read(), user_id=author_id).exists()
+
+
+def left_celebrities(author_id):
+    """Подписчиков только что стало на одного меньше порога знаменитости."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_CELEBRITY_FOLLOWERS - 1,
+    ).exists()
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def add_entries(user_ids, posts):
+    """Разложить посты по лентам читателей пачками по TIMELINE_FANOUT_BATCH."""
+    entries = (
+        TimelineEntry(
+            user_id=user_id, post_id=post.pk, author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in user_ids
+        for post in posts
+    )
+    for batch in batches(entries, settings.TIMELINE_FANOUT_BATCH):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Записать новый пост в ленты подписчиков автора.
+
+    Посты авторов с огромной аудиторией не раскладываются: запись заняла
+    бы слишком много строк, их подмешивает TimelinePaginator при чтении.
+    """
+    if is_celebrity(post.author_id):
+        return False
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    add_entries(followers.iterator(), [post])
+    return True
+
+
+def recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .only('pk', 'author', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    )
+
+
+def backfill(user_ids, author_id):
+    """Положить в ленты последние посты автора, например после подписки."""
+    posts = recent_posts(author_id)
+    if posts:
+        add_entries(user_ids, posts)
+
+
+def backfill_followers(author_id):
+    """Автор перестал быть знаменитостью: его посты снова берутся из лент."""
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    backfill(followers.iterator(), author_id)
+
+
+def request_backfill(author_id):
+    """Отложить дозаполнение лент до backfill_timelines.
+
+    Каждое новое падение ниже порога сдвигает срок, поэтому автор,
+    которого то подписывают, то отписывают на пороге, не дозаполняется
+    на каждом шаге. До тех пор его посты подмешиваются при чтении.
+    """
+    Profile.objects.filter(user_id=author_id).update(
+        backfill_requested=timezone.now()
+    )
+
+
+def backfill_due(now=None):
+    """Дозаполнить ленты авторов, отмеченных раньше TIMELINE_BACKFILL_DELAY.
+
+    Возвращает число авторов, чьи посты разложены по лентам.
+    """
+    due = Profile.objects.filter(
+        backfill_requested__lte=(now or timezone.now()) - timedelta(
+            seconds=settings.TIMELINE_BACKFILL_DELAY
+        )
+    ).values_list('pk', 'user_id', 'backfill_requested')
+    done = 0
+    for pk, author_id, requested in due:
+        # Отметку могли сдвинуть после выборки: тогда автор подождет.
+        if not Profile.objects.filter(
+            pk=pk, backfill_requested=requested
+        ).update(backfill_requested=None):
+            continue
+        if not is_celebrity(author_id):
+            backfill_followers(author_id)
+            done += 1
+    return done
+
+
+def forget(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    return list(Follow.objects.filter(
+        merged_on_read('author__profile__'), user=user
+    ).values_list('author_id', flat=True))
+
+
+def after(position, pub_date, pk):
+    """Условие «дальше курсора» в направлении его движения."""
+    direction, cursor_date, cursor_pk = position
+    if direction == NEXT:
+        return Q(**{f'{pub_date}__lt': cursor_date}) | Q(
+            **{pub_date: cursor_date, f'{pk}__lt': cursor_pk}
+        )
+    return Q(**{f'{pub_date}__gt': cursor_date}) | Q(
+        **{pub_date: cursor_date, f'{pk}__gt': cursor_pk}
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: разложенные посты плюс посты знаменитостей.
+
+    Разложенная часть читается одним проходом по индексу ленты, посты
+    знаменитостей - по индексу (author, -pub_date, -id), и обе части
+    сливаются по (pub_date, id).
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(None, per_page)
+        self.user = user
+
+    def get_cursor_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        descending = position is None or position[0] == NEXT
+        limit = self.per_page + 1
+        entries = TimelineEntry.objects.filter(user=self.user).select_related(
+            'post__author', 'post__group'
+        ).only(*ENTRY_FIELDS).order_by('-pub_date', '-post_id')
+        if position is not None:
+            entries = entries.filter(after(position, 'pub_date', 'post_id'))
+        if not descending:
+            entries = entries.reverse()
+        rows = [entry.post for entry in entries[:limit]]
+        celebrities = followed_celebrities(self.user)
+        if celebrities:
+            posts = Post.objects.for_feed().filter(
+                author__in=celebrities
+            ).order_by('-pub_date', '-id')
+            if position is not None:
+                posts = posts.filter(after(position, 'pub_date', 'pk'))
+            if not descending:
+                posts = posts.reverse()
+            rows = self.merge(rows, posts[:limit], descending)[:limit]
+        if position is None:
+            return self._page_rows(rows, has_previous=False)
+        if descending:
+            return self._page_rows(rows, has_previous=True)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._cursor_page(rows, has_previous, has_next=True)
+
+    def merge(self, rows, other_rows, descending):
+        unique = {post.pk: post for post in (*rows, *other_rows)}
+        return sorted(
+            unique.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=descending,
+        )
+
+    def _page_rows(self, rows, has_previous):
+        has_next = len(rows) > self.per_page
+        return self._cursor_page(rows[:self.per_page], has_previous, has_next)
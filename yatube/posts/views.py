@@ -1,34 +1,55 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_GET
 
-from .forms import PostForm
-from .models import Group, Post, User
+from . import activity, counts, search
+from .cards import fill_comment_counts
+from .conditions import feed_condition, post_condition
+from .export import FORMATS, export_lines, export_rows, parse_since
+from .forms import CommentForm, PostForm
+from .models import Follow, Group, Post, User
+from .page_cache import (all_posts_scope, author_scope, cache_anonymous_page,
+                         group_scope)
+from .paginators import CountedPaginator, CursorPaginator
+from .timeline import TimelinePaginator
 
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
 
 
-def get_paginator(request, data_list):
-    paginator = Paginator(data_list, POSTS_ON_PAGE)
+def get_paginator(request, data_list, get_count, cursor=False):
+    if cursor and 'page' not in request.GET:
+        paginator = CursorPaginator(data_list, POSTS_ON_PAGE)
+        return paginator.get_cursor_page(request.GET.get('cursor'))
+    paginator = CountedPaginator(data_list, POSTS_ON_PAGE, get_count)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@feed_condition(all_posts_scope)
+@cache_anonymous_page(all_posts_scope, refresh=fill_comment_counts)
 def index(request):
-    posts = Post.objects.all()
-    page_obj = get_paginator(request, posts)
+    posts = Post.objects.for_feed()
+    page_obj = get_paginator(
+        request, posts, counts.all_posts_count, cursor=True
+    )
     context = {
         'page_obj': page_obj,
+        **activity.sidebar(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@feed_condition(group_scope)
+@cache_anonymous_page(group_scope, refresh=fill_comment_counts)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_paginator(request, posts)
+    posts = group.posts.for_feed()
+    page_obj = get_paginator(request, posts, lambda: group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,29 +57,63 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_condition(author_scope)
+@cache_anonymous_page(author_scope, refresh=fill_comment_counts)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = get_paginator(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts = author.posts.for_feed()
+    page_obj = get_paginator(
+        request, posts, lambda: counts.author_posts_count(author)
+    )
+    following = (
+        request.user.is_authenticated and request.user != author
+        and Follow.objects.filter(user=request.user, author=author).exists()
+    )
     context = {
         'page_obj': page_obj,
         'author': author,
+        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@post_condition
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), id=post_id
+    )
+    comments = CountedPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_ON_PAGE,
+        lambda: post.comments_count,
+    ).get_page(request.GET.get('page'))
     context = {
         'post': post,
+        'posts_count': counts.author_posts_count(post.author),
         'requser': request.user,
+        'form': CommentForm(),
+        'page_obj': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@login_required
+def add_comment(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    form = CommentForm(request.POST or None)
+    if form.is_valid():
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+    return redirect('posts:post_detail', post_id=post_id)
+
+
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         create_post = form.save(commit=False)
         create_post.author = request.user
@@ -73,9 +128,79 @@ def post_edit(request, post_id):
     edit_post = get_object_or_404(Post, id=post_id)
     if request.user != edit_post.author:
         return redirect('posts:post_detail', post_id)
-    form = PostForm(request.POST or None, instance=edit_post)
+    form = PostForm(
+        request.POST or None, files=request.FILES or None, instance=edit_post
+    )
     if form.is_valid():
         form.save()
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': True}
     return render(request, 'posts/create_post.html', context)
+
+
+@login_required
+def follow_index(request):
+    paginator = TimelinePaginator(request.user, POSTS_ON_PAGE)
+    page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search_posts(
+        query, request.GET.get('cursor'), POSTS_ON_PAGE
+    )
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+        'is_continued': 'cursor' in request.GET,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+EXPORT_CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+@staff_member_required
+@require_GET
+def post_export(request):
+    data_format = request.GET.get('format', 'jsonl')
+    if data_format not in FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки.')
+    try:
+        since = request.GET.get('since')
+        since = parse_since(since) if since else None
+        after_id = request.GET.get('after_id')
+        after_id = int(after_id) if after_id else None
+    except ValueError:
+        return HttpResponseBadRequest('Неверные параметры выгрузки.')
+    response = StreamingHttpResponse(
+        export_lines(data_format, export_rows(since, after_id)),
+        content_type=EXPORT_CONTENT_TYPES[data_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{data_format}"'
+    )
+    return response
@@ -0,0 +1,22 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, for example::
+
+    uvicorn yatube.asgi:application
+
+Django 2.2 has no ASGI support of its own, so requests are passed to the
+regular WSGI handler in a bounded thread pool, see core.asgi.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup(set_prefix=False)
+
+from core.asgi import WSGIToASGI  # noqa: E402
+
+application = WSGIToASGI()
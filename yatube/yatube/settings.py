@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
@@ -22,13 +24,49 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-DEBUG = True
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'detail': ('960', {'upscale': False}),
+}
+THUMBNAIL_QUEUE_LIMIT = 500
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+# Посты авторов, у которых подписчиков не меньше этого числа, не
+# раскладываются по лентам, а подмешиваются при чтении.
+TIMELINE_CELEBRITY_FOLLOWERS = 10000
+TIMELINE_FANOUT_BATCH = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 200
+# Через сколько секунд после падения ниже порога знаменитости команда
+# backfill_timelines раскладывает посты автора по лентам подписчиков.
+TIMELINE_BACKFILL_DELAY = 10 * 60
+# Популярные группы и активные авторы на главной: посты за последние
+# ACTIVITY_WINDOW_DAYS дней, считая сегодняшний, по ACTIVITY_SIDEBAR_SIZE
+# в каждом списке.
+ACTIVITY_WINDOW_DAYS = 7
+ACTIVITY_SIDEBAR_SIZE = 5
+
+# YATUBE_PROFILE=production включает настройки боевого сервера: без
+# отладки, с постоянными соединениями и настроенной SQLite.
+PROFILES = ('development', 'production')
+PROFILE = os.environ.get('YATUBE_PROFILE', 'development')
+if PROFILE not in PROFILES:
+    raise ImproperlyConfigured(
+        f'YATUBE_PROFILE: {PROFILE!r}, '
+        f'ожидается одно из {", ".join(PROFILES)}'
+    )
+PRODUCTION = PROFILE == 'production'
+
+# YATUBE_DEBUG=0: шаблоны кешируются, отладка выключена.
+DEBUG = os.environ.get('YATUBE_DEBUG', '0' if PRODUCTION else '1') != '0'
 
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
     '[::1]',
     'testserver',
+    *filter(None, os.environ.get('YATUBE_ALLOWED_HOSTS', '').split(',')),
 ]
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
@@ -55,6 +93,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerfStatsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,12 +107,21 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Каждый шаблон и include читается и разбирается один раз на процесс.
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -85,12 +134,80 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоков у yatube.asgi: столько запросов одновременно ходят в базу и
+# рисуют шаблоны, остальные ждут в event loop, не занимая потоков.
+ASGI_THREADS = int(os.environ.get('YATUBE_ASGI_THREADS', 8))
 
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get(
+            'YATUBE_DB_CONN_MAX_AGE', 600 if PRODUCTION else 0
+        )),
+    }
+}
+
+# YATUBE_DB_REPLICAS: пути к репликам основной базы через запятую.
+# С них читаются ленты из REPLICA_READ_VIEWS; после записи пользователь
+# REPLICA_STICKY_SECONDS секунд читает с основной базы.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_READ_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+]
+REPLICA_STICKY_SECONDS = 10
+
+# Выполняются core при каждом новом соединении с SQLite. WAL пускает
+# читателей параллельно с писателем; cache_size в КиБ со знаком минус.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+} if PRODUCTION else {}
+
+# YATUBE_CACHE_BACKEND: locmem (один процесс), file или db (общий для
+# воркеров кеш; для db нужен manage.py createcachetable).
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'yatube'),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'YATUBE_CACHE_BACKEND: {CACHE_BACKEND!r}, '
+        f'ожидается одно из {", ".join(CACHE_BACKENDS)}'
+    )
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
+        'TIMEOUT': int(os.environ.get('YATUBE_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.environ.get('YATUBE_CACHE_MAX_ENTRIES', 10000)
+            ),
+        },
     }
 }
 